@@ -1,4 +1,4 @@
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Union
 
 from pydantic import BaseModel, model_validator
 from utils.const import DEFAULT_ARGS, LLM_SUMMARY_REQUIRED, REQUIRED_ARGS
@@ -9,16 +9,34 @@ class LLMConfig(BaseModel):
     LLM YAML configuration validator.
     """
 
-    provider: Literal["hf", "openai"] = DEFAULT_ARGS.retriever.llm.provider
+    provider: Literal["hf", "openai", "openai_async"] = (
+        DEFAULT_ARGS.retriever.llm.provider
+    )
 
     # Huggingface related arguments
     device: Optional[str] = DEFAULT_ARGS.retriever.llm.device
+    max_batch_tokens: Optional[int] = DEFAULT_ARGS.retriever.llm.max_batch_tokens
+    num_workers: Optional[int] = DEFAULT_ARGS.retriever.llm.num_workers
+    backend: Literal["torch", "onnx"] = DEFAULT_ARGS.retriever.llm.backend
+    onnx_dir: Optional[str] = DEFAULT_ARGS.retriever.llm.onnx_dir
+    quantization: Optional[Literal["arm64", "avx2", "avx512", "avx512_vnni"]] = (
+        DEFAULT_ARGS.retriever.llm.quantization
+    )
+    parity_min_similarity: Optional[float] = (
+        DEFAULT_ARGS.retriever.llm.parity_min_similarity
+    )
 
     # OpenAI related arguments
     api_key: Optional[str] = DEFAULT_ARGS.retriever.llm.api_key
+    base_url: Optional[str] = DEFAULT_ARGS.retriever.llm.base_url
     model_name: Optional[str] = DEFAULT_ARGS.retriever.llm.model_name
     batch_size: Optional[int] = DEFAULT_ARGS.retriever.llm.batch_size
     num_threads: Optional[int] = DEFAULT_ARGS.retriever.llm.num_threads
+    requests_per_minute: Optional[int] = DEFAULT_ARGS.retriever.llm.requests_per_minute
+    max_retries: Optional[int] = DEFAULT_ARGS.retriever.llm.max_retries
+    embedding_cache_dir: Optional[str] = DEFAULT_ARGS.retriever.llm.embedding_cache_dir
+    query_cache_size: Optional[int] = DEFAULT_ARGS.retriever.llm.query_cache_size
+    query_cache_ttl: Optional[float] = DEFAULT_ARGS.retriever.llm.query_cache_ttl
     use_case: Literal["embedding", "generation", "reranking"] = (
         DEFAULT_ARGS.retriever.llm.use_case
     )
@@ -28,13 +46,30 @@ class LLMConfig(BaseModel):
     split_text_human_msg: Optional[str] = (
         DEFAULT_ARGS.retriever.llm.split_text_human_msg
     )
+    split_text_max_tokens: Optional[int] = (
+        DEFAULT_ARGS.retriever.llm.split_text_max_tokens
+    )
     summarize_msg: Optional[str] = DEFAULT_ARGS.retriever.llm.summarize_msg
     augment_msg: Optional[str] = DEFAULT_ARGS.retriever.llm.augment_msg
     rerank_msg: Optional[str] = DEFAULT_ARGS.retriever.llm.rerank_msg
+    rerank_listwise_msg: Optional[str] = DEFAULT_ARGS.retriever.llm.rerank_listwise_msg
+    rerank_mode: Literal["pointwise", "listwise"] = (
+        DEFAULT_ARGS.retriever.llm.rerank_mode
+    )
+    rerank_window_size: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_window_size
+    rerank_window_step: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_window_step
+    rerank_batch_size: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_batch_size
+    rerank_max_length: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_max_length
+    rerank_cache_size: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_cache_size
+    rerank_top_n: Optional[int] = DEFAULT_ARGS.retriever.llm.rerank_top_n
     generate_msg: Optional[str] = DEFAULT_ARGS.retriever.llm.generate_msg
 
     @model_validator(mode="before")
     def check_required_properties(cls, values):
+        # E.g. a list of rerankers, validated against the other union members
+        if not isinstance(values, dict):
+            return values
+
         retriever_llm_provider = values.get("provider")
 
         for required_arg in REQUIRED_ARGS.retriever.llm.provider[
@@ -50,6 +85,45 @@ class LLMConfig(BaseModel):
 
         return values
 
+    @model_validator(mode="after")
+    def check_rerank_window(self):
+        if self.rerank_mode != "listwise":
+            return self
+
+        for name in ["rerank_window_size", "rerank_window_step"]:
+            value = getattr(self, name)
+            if value is None or value < 1:
+                raise ValueError(
+                    f"`{name}` must be a positive integer, when reranking listwise."
+                )
+
+        return self
+
+
+class LoadingConfig(BaseModel):
+    """
+    Document loading YAML configuration validator.
+    """
+
+    exclude: List[str] = DEFAULT_ARGS.retriever.loading.exclude  # type: ignore
+    gitignore: Optional[bool] = DEFAULT_ARGS.retriever.loading.gitignore
+
+    # File size / kind related arguments
+    max_file_size: Optional[int] = DEFAULT_ARGS.retriever.loading.max_file_size
+    window_size: Optional[int] = DEFAULT_ARGS.retriever.loading.window_size
+    skip_generated: Optional[bool] = DEFAULT_ARGS.retriever.loading.skip_generated
+    dedup: Optional[bool] = DEFAULT_ARGS.retriever.loading.dedup
+
+    # Parallel processing related arguments
+    executor: Literal["thread", "process"] = DEFAULT_ARGS.retriever.loading.executor  # type: ignore  # noqa: E501
+    num_workers: Optional[int] = DEFAULT_ARGS.retriever.loading.num_workers
+    process_chunksize: Optional[int] = DEFAULT_ARGS.retriever.loading.process_chunksize
+
+    # Streaming related arguments
+    streaming: Optional[bool] = DEFAULT_ARGS.retriever.loading.streaming
+    queue_size: Optional[int] = DEFAULT_ARGS.retriever.loading.queue_size
+    batch_size: Optional[int] = DEFAULT_ARGS.retriever.loading.batch_size
+
 
 class MetadataConfig(BaseModel):
     """
@@ -58,6 +132,21 @@ class MetadataConfig(BaseModel):
 
     list: List[str] = DEFAULT_ARGS.retriever.metadata.list  # type: ignore
     llm_summary: Optional[LLMConfig] = DEFAULT_ARGS.retriever.metadata.llm_summary
+    summary_cache_path: Optional[str] = (
+        DEFAULT_ARGS.retriever.metadata.summary_cache_path
+    )
+    summary_cache_max_size: Optional[int] = (
+        DEFAULT_ARGS.retriever.metadata.summary_cache_max_size
+    )
+    batch_size: Optional[int] = DEFAULT_ARGS.retriever.metadata.batch_size
+
+    # Code structure related arguments
+    code_structure_max_size: Optional[int] = (
+        DEFAULT_ARGS.retriever.metadata.code_structure_max_size
+    )
+    code_structure_time_budget: Optional[float] = (
+        DEFAULT_ARGS.retriever.metadata.code_structure_time_budget
+    )
 
     @model_validator(mode="before")
     def check_required_properties(cls, values):
@@ -81,6 +170,8 @@ class EvalConfig(BaseModel):
     """
 
     augment_query: Optional[LLMConfig] = DEFAULT_ARGS.retriever.eval.augment_query
+    augment_cache_path: Optional[str] = DEFAULT_ARGS.retriever.eval.augment_cache_path
+    num_workers: Optional[int] = DEFAULT_ARGS.retriever.eval.num_workers
 
 
 class ChunkingConfig(BaseModel):
@@ -89,15 +180,20 @@ class ChunkingConfig(BaseModel):
     """
 
     type: Literal[
-        "RecursiveCharacterTextSplitter", "LLMChunking"
+        "RecursiveCharacterTextSplitter", "CodeChunking", "LLMChunking"
     ] = DEFAULT_ARGS.retriever.chunking.type  # type: ignore
 
-    # RecursiveCharacterTextSplitter related arguments
+    # RecursiveCharacterTextSplitter (and CodeChunking) related arguments
     chunk_size: Optional[int] = DEFAULT_ARGS.retriever.chunking.chunk_size
     chunk_overlap: Optional[int] = DEFAULT_ARGS.retriever.chunking.chunk_overlap
+    num_workers: Optional[int] = DEFAULT_ARGS.retriever.chunking.num_workers
 
     # LLMChunking related arguments
     llm_setup: Optional[LLMConfig] = DEFAULT_ARGS.retriever.chunking.llm_setup
+    checkpoint_path: Optional[str] = DEFAULT_ARGS.retriever.chunking.checkpoint_path
+
+    # Near-duplicate chunk elimination
+    dedup_threshold: Optional[float] = DEFAULT_ARGS.retriever.chunking.dedup_threshold
 
     @model_validator(mode="before")
     def check_required_properties(cls, values):
@@ -123,6 +219,7 @@ class DBConfig(BaseModel):
     provider: Literal["chromadb", "faiss"] = DEFAULT_ARGS.retriever.db.provider  # type: ignore  # noqa: E501
     collection_name: Optional[str] = DEFAULT_ARGS.retriever.db.collection_name
     persist_dir: Optional[str] = DEFAULT_ARGS.retriever.db.persist_dir
+    incremental: Optional[bool] = DEFAULT_ARGS.retriever.db.incremental
 
     @model_validator(mode="before")
     def check_required_properties(cls, values):
@@ -146,13 +243,25 @@ class RetrieverConfig(BaseModel):
     """
 
     eval: Optional[EvalConfig] = None
+    loading: LoadingConfig = LoadingConfig()
     metadata: Optional[MetadataConfig] = None
     chunking: ChunkingConfig
     db: DBConfig
     llm: LLMConfig
     bm25: Optional[Literal["docs", "chunks"]] = None
-    rerank: Optional[LLMConfig] = None
+    # A single reranker, or a cascade of them
+    rerank: Optional[Union[LLMConfig, List[LLMConfig]]] = None
     k: Optional[int] = 10
+    fetch_factor: Optional[int] = DEFAULT_ARGS.retriever.fetch_factor
+
+    @model_validator(mode="after")
+    def check_streaming(self):
+        if self.loading.streaming and self.db.incremental:
+            raise ValueError(
+                "Streaming cannot be combined with incremental indexing (`db`)."
+            )
+
+        return self
 
 
 class ConfigValidator(BaseModel):
@@ -1,12 +1,16 @@
-from .chunking import chunk_docs, make_text_chunker
+from .chunking import chunk_docs, iter_chunks, make_text_chunker
 from .eval import preprocess_eval
-from .loading import load_docs
+from .loading import iter_docs, load_docs
 from .metadata import add_doc_metadata
+from .near_dedup import dedup_chunks
 
 __all__ = [
     "load_docs",
+    "iter_docs",
     "add_doc_metadata",
     "make_text_chunker",
     "chunk_docs",
+    "iter_chunks",
+    "dedup_chunks",
     "preprocess_eval",
 ]
@@ -1,31 +1,150 @@
-from typing import List
+import heapq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 import progressbar
 from box import Box
 from handlers.auto import AbstractLLM, AutoLLM
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.chunk_store import ChunkStore
+from utils.stream import batched
 
+from .code_chunker import CodeChunker
 
-def chunk_docs(documents: List[Document], text_chunker) -> List[dict]:
+
+def split_content(
+    text: str, file_extension: str, text_chunker
+) -> List[Tuple[str, dict]]:
+    """
+    Split the content of a single document, using a (non-LLM) text chunker.
+
+    Args:
+        text (str): Content of the document.
+        file_extension (str): Extension of the file the document comes from.
+        text_chunker: Chunker to be used for splitting.
+
+    Returns:
+        List[Tuple[str, dict]]: Splits, alongside the metadata specific to them
+            (line offsets, for the code chunker).
+    """
+    if isinstance(text_chunker, CodeChunker):
+        return [
+            (split, {"start_line": start_line, "end_line": end_line})
+            for split, start_line, end_line in text_chunker.split_code(
+                text, file_extension
+            )
+        ]
+
+    return [(split, {}) for split in text_chunker.split_text(text)]
+
+
+def make_chunks(doc: Document, splits: List[Tuple[str, dict]]) -> List[Document]:
+    """
+    Wrap the splits of a document into chunks.
+    Chunks inherit the metadata of the original document, extended with the
+    metadata specific to the split, if any.
+    """
+    return [
+        Document(
+            page_content=split,
+            metadata=(
+                {**doc.metadata, **split_metadata} if split_metadata else doc.metadata
+            ),
+        )
+        for split, split_metadata in splits
+    ]
+
+
+def split_doc(doc: Document, text_chunker) -> List[Document]:
+    """
+    Split a single document into chunks, using a (non-LLM) text chunker.
+    Chunks inherit the metadata of the original document.
+
+    Args:
+        doc (Document): Document to be split into chunks.
+        text_chunker: Chunker to be used for document splitting.
+
+    Returns:
+        List[Document]: List of chunks of the given document.
+    """
+    return make_chunks(
+        doc,
+        split_content(doc.page_content, doc.metadata.get("ext", ""), text_chunker),
+    )
+
+
+def split_texts(
+    texts: List[Tuple[str, str]], text_chunker
+) -> List[List[Tuple[str, dict]]]:
+    """
+    Split a batch of texts, given alongside their file extensions.
+    Used as a single task of the process pool.
+    """
+    return [
+        split_content(text, file_extension, text_chunker)
+        for text, file_extension in texts
+    ]
+
+
+def balance_batches(sizes: List[int], num_batches: int) -> List[List[int]]:
+    """
+    Distribute items into (at most) `num_batches` batches of similar total size,
+    greedily assigning the largest remaining item to the smallest batch.
+
+    Args:
+        sizes (List[int]): Size of each item.
+        num_batches (int): Number of batches to create.
+
+    Returns:
+        List[List[int]]: Non-empty batches, as lists of item indices.
+    """
+    batches: List[List[int]] = [[] for _ in range(num_batches)]
+    heap = [(0, batch_idx) for batch_idx in range(num_batches)]
+
+    for idx in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        total, batch_idx = heapq.heappop(heap)
+        batches[batch_idx].append(idx)
+        heapq.heappush(heap, (total + sizes[idx], batch_idx))
+
+    return [sorted(batch) for batch in batches if batch]
+
+
+def chunk_docs(
+    documents: List[Document],
+    text_chunker,
+    num_workers: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+) -> ChunkStore:
     """
     Split documents into chunks.
+    If `num_workers` > 1, (non-LLM) splitting is done in a process pool.
+    Documents are sent to the workers in size-balanced batches, and chunks are
+    returned in the same order as in the sequential case.
 
     Args:
         documents (List[documents]): List of documents to be split into chunks.
         text_chunker: Chunker to be used for single document splitting.
+        num_workers (Optional[int]): Number of worker processes to use.
+        checkpoint_path (Optional[str]): (LLM chunker) Path to the file to save
+            chunks of finished documents to, so the chunking can be resumed.
 
     Returns:
-        all_chunks (List[dict]): Combined list of all chunks, from all provided
-        documents. Each chunk is represented as a dictionary, containing the text
-        of the split, and the source (file it is extracted from).
+        all_chunks (ChunkStore): Combined list of all chunks, from all provided
+        documents. Chunks are kept as spans of the documents' content, and are
+        materialized into Documents (with the text of the split, and the
+        metadata of the document it is extracted from) on access.
     """
-    all_chunks = []
+    all_chunks = ChunkStore()
 
     if isinstance(text_chunker, AbstractLLM):
-        all_chunks = text_chunker.split_text_in_batches(
-            [doc.page_content for doc in documents]
+        llm_splits = text_chunker.split_text_in_batches(
+            [doc.page_content for doc in documents], checkpoint_path=checkpoint_path
         )
+        for doc, llm_doc_splits in zip(documents, llm_splits):
+            all_chunks.add_chunks(
+                all_chunks.add_document(doc), [(split, {}) for split in llm_doc_splits]
+            )
     else:
         with progressbar.ProgressBar(
             widgets=[
@@ -39,21 +158,83 @@ def chunk_docs(documents: List[Document], text_chunker) -> List[dict]:
             ],
             max_value=len(documents),
         ) as bar:
-            for i, doc in enumerate(documents):
-                splits = text_chunker.split_text(doc.page_content)
-                for split in splits:
-                    all_chunks.append(
-                        Document(
-                            page_content=split,
-                            metadata=doc.metadata,
-                        )
+            if num_workers is None or num_workers <= 1:
+                for i, doc in enumerate(documents):
+                    all_chunks.add_chunks(
+                        all_chunks.add_document(doc),
+                        split_content(
+                            doc.page_content, doc.metadata.get("ext", ""), text_chunker
+                        ),
                     )
+                    bar.update(i + 1)
+                return all_chunks
+
+            # Several batches per worker, so a slow batch does not hold up
+            # the whole pool
+            batches = balance_batches(
+                [len(doc.page_content) for doc in documents], 4 * num_workers
+            )
+
+            doc_splits: List[List[Tuple[str, dict]]] = [[] for _ in documents]
+            num_done = 0
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                future_to_batch = {
+                    executor.submit(
+                        split_texts,
+                        [
+                            (
+                                documents[idx].page_content,
+                                documents[idx].metadata.get("ext", ""),
+                            )
+                            for idx in batch
+                        ],
+                        text_chunker,
+                    ): batch
+                    for batch in batches
+                }
 
-                bar.update(i + 1)
+                for future in as_completed(future_to_batch):
+                    batch = future_to_batch[future]
+                    for idx, splits in zip(batch, future.result()):
+                        doc_splits[idx] = splits
+
+                    num_done += len(batch)
+                    bar.update(num_done)
+
+            for doc, splits in zip(documents, doc_splits):
+                all_chunks.add_chunks(all_chunks.add_document(doc), splits)
 
     return all_chunks
 
 
+def iter_chunks(
+    documents: Iterable[Document],
+    text_chunker,
+    batch_size: int = 16,
+    checkpoint_path: Optional[str] = None,
+) -> Iterator[Document]:
+    """
+    Lazily split the stream of documents into chunks.
+    Used for streaming, where documents are not known upfront.
+
+    Args:
+        documents (Iterable[Document]): Stream of documents to be split.
+        text_chunker: Chunker to be used for single document splitting.
+        batch_size (int): Number of documents to pass at once to an LLM chunker.
+        checkpoint_path (Optional[str]): (LLM chunker) Path to the checkpoint
+            file, as in `chunk_docs`.
+
+    Returns:
+        Iterator[Document]: Chunks, in the order of the incoming documents.
+    """
+    if isinstance(text_chunker, AbstractLLM):
+        for batch in batched(documents, batch_size):
+            yield from chunk_docs(batch, text_chunker, checkpoint_path=checkpoint_path)
+    else:
+        for doc in documents:
+            yield from split_doc(doc, text_chunker)
+
+
 def make_text_chunker(chunker_args: Box):
     """
     Find the appropriate chunking method and return the fully initialized chunker.
@@ -66,12 +247,19 @@ def make_text_chunker(chunker_args: Box):
     Returns:
         Text chunker.
     """
-    text_chunker = None
+    text_chunker: Optional[
+        Union[RecursiveCharacterTextSplitter, CodeChunker, AbstractLLM]
+    ] = None
     if chunker_args.type == "RecursiveCharacterTextSplitter":
         text_chunker = RecursiveCharacterTextSplitter(
             chunk_size=chunker_args.chunk_size,
             chunk_overlap=chunker_args.chunk_overlap,
         )
+    elif chunker_args.type == "CodeChunking":
+        text_chunker = CodeChunker(
+            chunk_size=chunker_args.chunk_size,
+            chunk_overlap=chunker_args.chunk_overlap,
+        )
     elif chunker_args.type == "LLMChunking":
         text_chunker = AutoLLM.from_args(chunker_args.llm_setup)
 
@@ -0,0 +1,185 @@
+import ast
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from .codeparser import CodeParser
+
+__all__ = ["CodeChunker"]
+
+# Chunk text, alongside its first and last line (1-based, inclusive)
+CodeChunk = Tuple[str, int, int]
+
+# Headers prepended to the document content by the metadata pieces
+# (see `data_processing.metadata`)
+HEADER_PREFIXES = ("LLM Summary: ", "Functions: ")
+HEADER_SEPARATOR = "\n\nContent: "
+
+
+def split_header(text: str) -> Tuple[str, str]:
+    """
+    Separate the metadata headers (e.g. code structure, LLM summary) from the
+    original content of the document.
+
+    Args:
+        text (str): Content of the document.
+
+    Returns:
+        Tuple[str, str]: Headers (empty if none) and the original content.
+    """
+    code_start = 0
+    while text.startswith(HEADER_PREFIXES, code_start):
+        separator_idx = text.find(HEADER_SEPARATOR, code_start)
+        if separator_idx == -1:
+            break
+        code_start = separator_idx + len(HEADER_SEPARATOR)
+
+    return text[:code_start], text[code_start:]
+
+
+class CodeChunker:
+    """
+    Syntax-aware chunker, splitting the code at function / class boundaries.
+
+    Definitions are found the same way as in `CodeParser` (AST for Python,
+    line-based patterns for other languages). Consecutive small units are
+    merged up to `chunk_size` characters, while units larger than that are
+    split by size, same as with `RecursiveCharacterTextSplitter`.
+    Unsupported languages (and plain text) are split by size only.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+
+    @staticmethod
+    def line_offsets(code: str) -> List[int]:
+        """
+        Compute the character offset each line of the code starts at.
+        Computed once per document, so mapping offsets to lines is a binary
+        search.
+        """
+        return [0] + [match.end() for match in re.finditer("\n", code)]
+
+    @staticmethod
+    def unit_lines(code: str, file_extension: str) -> List[int]:
+        """
+        Find the lines (1-based) syntactic units of the code start at.
+
+        For Python, units are top-level statements, with each function and
+        class (including its decorators) starting a new unit. For other
+        languages, each definition starts a new unit.
+        """
+        if CodeParser.detect_language(file_extension) == "python":
+            try:
+                tree = ast.parse(code)
+            except Exception:
+                tree = None
+
+            if tree is not None:
+                return [
+                    min(
+                        [node.lineno]
+                        + [dec.lineno for dec in getattr(node, "decorator_list", [])]
+                    )
+                    for node in tree.body
+                    if isinstance(
+                        node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+                    )
+                ]
+
+        return [
+            symbol.line for symbol in CodeParser.parse_symbols(code, file_extension)
+        ]
+
+    def split_units(self, code: str, file_extension: str) -> List[Tuple[int, int]]:
+        """
+        Split the code into syntactic units, merging consecutive small units.
+
+        Returns:
+            List[Tuple[int, int]]: Start and end offsets of the units.
+        """
+        offsets = CodeChunker.line_offsets(code)
+        starts = sorted(
+            {offsets[line - 1] for line in self.unit_lines(code, file_extension)} | {0}
+        )
+        bounds = starts[1:] + [len(code)]
+
+        units: List[Tuple[int, int]] = []
+        for start, end in zip(starts, bounds):
+            if start == end:
+                continue
+            if units and end - units[-1][0] <= self.chunk_size:
+                units[-1] = (units[-1][0], end)
+            else:
+                units.append((start, end))
+
+        return units
+
+    def split_code(
+        self, text: str, file_extension: Optional[str] = None
+    ) -> List[CodeChunk]:
+        """
+        Split the code into chunks.
+        Metadata headers, if present, are kept at the beginning of the first
+        chunk, and are not counted towards the line numbers.
+
+        Args:
+            text (str): Content of the document.
+            file_extension (Optional[str]): File extension, used to determine
+                the language of the code (e.g. ".py").
+
+        Returns:
+            List[CodeChunk]: Chunks, alongside their first and last lines.
+        """
+        header, code = split_header(text)
+        offsets = CodeChunker.line_offsets(code)
+
+        def to_line(offset: int) -> int:
+            return bisect_right(offsets, offset)
+
+        chunks: List[CodeChunk] = []
+        for start, end in self.split_units(code, file_extension or ""):
+            unit = code[start:end]
+            if end - start <= self.chunk_size:
+                splits = [(unit.strip(), start)]
+            else:
+                splits = [
+                    (split.page_content, start + split.metadata["start_index"])
+                    for split in self.text_splitter.create_documents([unit])
+                ]
+
+            for split, split_start in splits:
+                if not split:
+                    continue
+                # Skip the leading whitespace stripped off the split
+                split_start = code.find(split, split_start)
+                chunks.append(
+                    (
+                        split,
+                        to_line(split_start),
+                        to_line(split_start + len(split) - 1),
+                    )
+                )
+
+        if header:
+            if chunks:
+                first_split, start_line, end_line = chunks[0]
+                chunks[0] = (header + first_split, start_line, end_line)
+            else:
+                chunks.append((header.strip(), 1, 1))
+
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split the text into chunks, without knowing its language.
+        Provided for compatibility with other (text) chunkers.
+        """
+        return [split for split, _, _ in self.split_code(text)]
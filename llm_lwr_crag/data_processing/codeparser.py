@@ -1,12 +1,28 @@
 import ast
 import re
-from typing import List, Tuple
+import time
+from typing import List, NamedTuple, Optional, Pattern, Tuple
+
+
+class Symbol(NamedTuple):
+    """
+    Function or class definition, found in the code.
+    """
+
+    name: str
+    kind: str  # "function" or "class"
+    line: int  # 1-based line of the definition
 
 
 class CodeParser:
     """
     A universal code parser that extracts function and class definitions
     from 20+ programming languages and frameworks.
+
+    Apart from Python (parsed with AST), definitions are matched line by line.
+    Lines are length-capped and the patterns avoid nested or overlapping
+    quantifiers, so matching takes time linear in the size of the code, even
+    on minified bundles and long generated files.
     """
 
     EXTENSION_MAP = {
@@ -38,6 +54,80 @@ class CodeParser:
         ".svelte": "svelte",
     }
 
+    # Lines longer than this are skipped - they are practically always minified
+    # or generated, and not worth matching
+    MAX_LINE_LENGTH = 1000
+
+    # Default per-file budgets
+    MAX_SIZE = 1_000_000  # Characters
+    TIME_BUDGET = 1.0  # Seconds
+
+    # Check the time budget once per this many lines
+    TIME_CHECK_INTERVAL = 256
+
+    # Names the function patterns may capture, that are not definitions
+    KEYWORDS = {
+        "if",
+        "for",
+        "while",
+        "switch",
+        "catch",
+        "return",
+        "new",
+        "else",
+        "throw",
+        "function",
+        "sizeof",
+    }
+
+    # Generic patterns
+    CLASS_PATTERN = re.compile(r"\bclass\s+(\w+)")
+
+    # Per-language patterns, compiled only once
+    _JS_FUNCTION_PATTERN = (
+        r"\bfunction\s*\*?\s*(\w+)\s*\("
+        r"|\b(\w+)\s*[:=]\s*(?:async\s+)?(?:function\b|\([^()\n]*\)\s*=>|\w+\s*=>)"
+    )
+    _JVM_FUNCTION_PATTERN = (
+        r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|"
+        r"synchronized|native|override|virtual|async|sealed|extern|unsafe|"
+        r"partial|readonly)\s+)*"
+        r"(?!(?:return|new|else|throw|await)\b)[\w<>\[\],.?]+\s+(\w+)\s*\("
+    )
+    FUNCTION_PATTERNS = {
+        language: re.compile(pattern)
+        for language, pattern in {
+            # Python, used only if the code cannot be parsed with AST
+            "python": r"^\s*(?:async\s+)?def\s+(\w+)",
+            # Regular programming languages
+            "java": _JVM_FUNCTION_PATTERN,
+            "javascript": _JS_FUNCTION_PATTERN,
+            "typescript": _JS_FUNCTION_PATTERN,
+            "react": _JS_FUNCTION_PATTERN,
+            "csharp": _JVM_FUNCTION_PATTERN,
+            "cpp": r"\b\w+[\s*&]+(\w+)\s*\([^()\n]*\)\s*(?:const\s*)?\{",
+            "c": r"\b\w+[\s*&]+(\w+)\s*\([^()\n]*\)\s*\{",
+            "swift": r"\bfunc\s+(\w+)",
+            "go": r"\bfunc\s+(?:\([^()\n]*\)\s*)?(\w+)\s*[(\[]",
+            "ruby": r"\bdef\s+(?:self\.)?(\w+[?!]?)",
+            "php": r"\bfunction\s+&?(\w+)\s*\(",
+            "rust": r"\bfn\s+(\w+)",
+            "kotlin": r"\bfun\s+(?:<[^<>\n]*>\s*)?(?:\w+\.)?(\w+)\s*\(",
+            "dart": r"\b(?:static\s+)?\w+\s+(\w+)\s*\(",
+            "scala": r"\bdef\s+(\w+)",
+            "lua": r"\bfunction\s+(?:\w+[.:])*(\w+)\s*\(",
+            "r": r"\b(\w+)\s*<-\s*function\s*\(",
+            "perl": r"\bsub\s+(\w+)",
+            "shell": r"^\s*(?:function\s+(\w+)|(\w+)\s*\(\)\s*\{)",
+            "matlab": r"^\s*function\s+(?:(?:\[[^\]\n]*\]|\w+)\s*=\s*)?(\w+)",
+            # Frameworks - scripts are JavaScript, with method shorthands
+            # (e.g. `methods: { save() { ... } }`)
+            "vue": _JS_FUNCTION_PATTERN
+            + r"|^\s*(?:async\s+)?(\w+)\s*\([^()\n]*\)\s*\{",
+            "svelte": _JS_FUNCTION_PATTERN,
+        }.items()
+    }
+
     @staticmethod
     def detect_language(file_extension: str) -> str:
         """Detect programming language based on file extension."""
@@ -55,96 +145,100 @@ class CodeParser:
         Returns:
             Tuple[List[str], List[str]]: (List of function names, List of class names)
         """
+        symbols = CodeParser.parse_symbols(code, file_extension)
+        functions = [sym.name for sym in symbols if sym.kind == "function"]
+        classes = [sym.name for sym in symbols if sym.kind == "class"]
+        return functions, classes
+
+    @staticmethod
+    def parse_symbols(
+        code: str,
+        file_extension: str,
+        max_size: Optional[int] = None,
+        time_budget: Optional[float] = None,
+    ) -> List[Symbol]:
+        """
+        Parse the given code and extract function and class definitions,
+        alongside the lines they are defined at.
+
+        Args:
+            code (str): The source code.
+            file_extension (str): The file extension (e.g., '.py', '.vue').
+            max_size (Optional[int]): Only the first `max_size` characters of
+                the code are parsed. Defaults to `CodeParser.MAX_SIZE`.
+            time_budget (Optional[float]): Parsing stops after `time_budget`
+                seconds, returning the definitions found so far. Defaults to
+                `CodeParser.TIME_BUDGET`.
+
+        Returns:
+            List[Symbol]: Definitions, ordered by line (for Python, in AST
+                traversal order).
+        """
         language = CodeParser.detect_language(file_extension)
+        if language not in CodeParser.FUNCTION_PATTERNS:
+            return []
+
+        max_size = CodeParser.MAX_SIZE if max_size is None else max_size
+        time_budget = CodeParser.TIME_BUDGET if time_budget is None else time_budget
+        deadline = time.monotonic() + time_budget
+
+        if len(code) > max_size:
+            # Cut at the line boundary, to not match a partial definition
+            code = code[: code.rfind("\n", 0, max_size) + 1]
 
         if language == "python":
-            return CodeParser._parse_python(code)
-        elif language in {
-            "java",
-            "javascript",
-            "typescript",
-            "react",
-            "csharp",
-            "cpp",
-            "c",
-            "swift",
-            "go",
-            "ruby",
-            "php",
-            "rust",
-            "kotlin",
-            "dart",
-            "scala",
-            "lua",
-            "r",
-            "perl",
-            "shell",
-            "matlab",
-            "vue",
-            "svelte",
-        }:
-            return CodeParser._parse_general(code, language)
-        else:
-            return [], []
+            symbols = CodeParser._parse_python(code)
+            if symbols is not None:
+                return symbols
+
+        return CodeParser._parse_general(
+            code, CodeParser.FUNCTION_PATTERNS[language], deadline
+        )
 
     @staticmethod
-    def _parse_python(code: str) -> Tuple[List[str], List[str]]:
-        """Extract function and class names from Python code using AST."""
+    def _parse_python(code: str) -> Optional[List[Symbol]]:
+        """
+        Extract function and class definitions from Python code using AST.
+        Returns None if the code cannot be parsed.
+        """
         try:
             tree = ast.parse(code)
-            functions = [
-                node.name
-                for node in ast.walk(tree)
-                if isinstance(node, ast.FunctionDef)
-            ]
-            classes = [
-                node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)
-            ]
-            return functions, classes
         except Exception:
-            return [], []
+            return None
+
+        # Single, breadth-first pass over the AST
+        symbols = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                symbols.append(Symbol(node.name, "function", node.lineno))
+            elif isinstance(node, ast.ClassDef):
+                symbols.append(Symbol(node.name, "class", node.lineno))
+        return symbols
 
     @staticmethod
-    def _parse_general(code: str, language: str) -> Tuple[List[str], List[str]]:
+    def _parse_general(
+        code: str, function_pattern: Pattern, deadline: float
+    ) -> List[Symbol]:
         """
-        Extract function and class names from various languages and frameworks
-        using regex.
+        Extract function and class definitions from various languages and
+        frameworks using regex, line by line.
         """
+        symbols = []
+        for line_no, line in enumerate(code.splitlines(), start=1):
+            if line_no % CodeParser.TIME_CHECK_INTERVAL == 0:
+                if time.monotonic() > deadline:
+                    break
 
-        # Generic patterns
-        class_pattern = r"\bclass\s+(\w+)"
+            if len(line) > CodeParser.MAX_LINE_LENGTH:
+                continue
 
-        function_patterns = {
-            # Regular programming languages
-            "java": r"\b(?:public|private|protected|static|\s)*\s+\w+\s+(\w+)\s*\(",
-            "javascript": r"\bfunction\s+(\w+)\s*\(|\b(\w+)\s*=\s*\(.*?\)\s*=>",
-            "typescript": r"\bfunction\s+(\w+)\s*\(|\b(\w+)\s*=\s*\(.*?\)\s*=>",
-            "react": r"\bfunction\s+(\w+)\s*\(|\bconst\s+(\w+)\s*=\s*\(.*?\)\s*=>",
-            "csharp": r"\b(?:public|private|protected|static|\s)*\s+\w+\s+(\w+)\s*\(",
-            "cpp": r"\b\w+\s+(\w+)\s*\([^)]*\)\s*\{",
-            "c": r"\b\w+\s+(\w+)\s*\([^)]*\)\s*\{",
-            "swift": r"\bfunc\s+(\w+)\s*\(",
-            "go": r"\bfunc\s+(\w+)\s*\(",
-            "ruby": r"\bdef\s+(\w+)",
-            "php": r"\bfunction\s+(\w+)\s*\(",
-            "rust": r"\bfn\s+(\w+)\s*\(",
-            "kotlin": r"\bfun\s+(\w+)\s*\(",
-            "dart": r"\b(?:static\s+)?\w+\s+(\w+)\s*\(",
-            "scala": r"\bdef\s+(\w+)\s*\(",
-            "lua": r"\bfunction\s+(\w+)\s*\(",
-            "r": r"\b(\w+)\s*<- function\(",
-            "perl": r"\bsub\s+(\w+)\s*\{",
-            "shell": r"\b(\w+)\s*\(\)\s*\{",
-            "matlab": r"\bfunction\s+[^\s]+\s+(\w+)\s*\(",
-            # Frameworks
-            "vue": r"\bexport\s+default\s+{\s*methods\s*:\s*{([^}]*)}|methods\s*:\s*{([^}]*)}",  # noqa: E501
-            "svelte": r"\bexport\s+function\s+(\w+)\s*\(|\bfunction\s+(\w+)\s*\(",
-        }
-
-        function_pattern = function_patterns.get(language, None)
-        functions = re.findall(function_pattern, code) if function_pattern else []
-        functions = [f for f in functions if f]
-
-        classes = re.findall(class_pattern, code)
+            for match in CodeParser.CLASS_PATTERN.finditer(line):
+                symbols.append(Symbol(match.group(1), "class", line_no))
 
-        return functions, classes
+            for match in function_pattern.finditer(line):
+                # Take the first matched group, out of the pattern alternatives
+                name = next((group for group in match.groups() if group), None)
+                if name and name not in CodeParser.KEYWORDS:
+                    symbols.append(Symbol(name, "function", line_no))
+
+        return symbols
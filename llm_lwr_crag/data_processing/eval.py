@@ -2,7 +2,7 @@ import pandas as pd
 from box import Box
 from utils.logging import logger
 
-from .metadata import augment_query
+from .metadata import augment_queries
 
 
 def preprocess_eval(eval_df: pd.DataFrame, metadata_args: Box) -> None:
@@ -21,7 +21,7 @@ def preprocess_eval(eval_df: pd.DataFrame, metadata_args: Box) -> None:
         return
     if metadata_args.augment_query:
         logger.info("Augmenting queries...")
-        eval_df["question"] = eval_df["question"].apply(
-            lambda query: augment_query(query, metadata_args)
+        eval_df["question"] = augment_queries(
+            eval_df["question"].tolist(), metadata_args
         )
         logger.info("Finished augmenting queries...")
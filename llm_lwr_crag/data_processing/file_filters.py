@@ -0,0 +1,126 @@
+import fnmatch
+import re
+
+__all__ = ["HEAD_SIZE", "is_binary", "is_minified", "is_generated"]
+
+# Number of leading bytes used to classify a file
+HEAD_SIZE = 8192
+
+# Lockfiles and other files generated by package managers / tools
+GENERATED_FILE_NAMES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "composer.lock",
+    "Gemfile.lock",
+    "Cargo.lock",
+    "poetry.lock",
+    "Pipfile.lock",
+    "pdm.lock",
+    "uv.lock",
+    "go.sum",
+    "packages.lock.json",
+    "pubspec.lock",
+    "mix.lock",
+    "flake.lock",
+}
+
+GENERATED_FILE_PATTERNS = [
+    "*.min.js",
+    "*.min.css",
+    "*.min.mjs",
+    "*.bundle.js",
+    "*.chunk.js",
+    "*.map",
+    "*.pb.go",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.cc",
+    "*.pb.h",
+    "*.generated.*",
+    "*.g.dart",
+    "*.freezed.dart",
+    "*.designer.cs",
+]
+
+# Header lines placed by code generators, matched as whole comment lines:
+#   (1) Go convention, e.g. "// Code generated by protoc-gen-go. DO NOT EDIT."
+#   (2) standalone generated tag, e.g. "# @generated" (Meta / Buck tools)
+#   (3) "Generated by <tool>. DO NOT EDIT", e.g. protobuf Python modules
+GENERATED_HEADER_PATTERN = re.compile(
+    rb"^// Code generated .* DO NOT EDIT\.\r?$"
+    rb"|^[ \t]*(?:#|//|/?\*+|--)[ \t]*@generated\b"
+    rb"|^[ \t]*(?:#|//|/?\*+)[ \t]*(?:Code )?[Gg]enerated by .*DO NOT EDIT",
+    re.MULTILINE,
+)
+
+# Extensions of files that are commonly minified - other files (e.g. prose,
+# with unwrapped paragraphs) may have long lines as well
+MINIFIABLE_EXTENSIONS = {
+    ".js",
+    ".mjs",
+    ".cjs",
+    ".jsx",
+    ".ts",
+    ".tsx",
+    ".css",
+    ".scss",
+    ".less",
+    ".html",
+    ".htm",
+    ".json",
+    ".svg",
+    ".xml",
+}
+
+# Bytes that never appear in (UTF-8) text files, apart from common whitespace
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+
+def is_binary(head: bytes) -> bool:
+    """
+    Check whether the file is binary, based on its leading bytes.
+    Same heuristic as used by `git` / `file`: NUL bytes, or a large share of
+    control characters.
+    """
+    if not head:
+        return False
+    if b"\x00" in head:
+        return True
+
+    non_text = head.translate(None, _TEXT_BYTES)
+    return len(non_text) / len(head) > 0.3
+
+
+def is_minified(ext: str, head: bytes, max_avg_line_length: int = 300) -> bool:
+    """
+    Check whether the file is minified, based on its extension and leading
+    bytes, i.e. whether it is a (web) code file whose lines are, on average,
+    extremely long.
+    """
+    if ext.lower() not in MINIFIABLE_EXTENSIONS:
+        return False
+
+    if len(head) < HEAD_SIZE:
+        # Whole file is within the head, take the real average
+        num_lines = head.count(b"\n") + 1
+    else:
+        # Last line is most likely cut
+        num_lines = max(head.count(b"\n"), 1)
+    return len(head) / num_lines > max_avg_line_length
+
+
+def is_generated(file_name: str, head: bytes) -> bool:
+    """
+    Check whether the file is generated (e.g. lockfile, compiled protobuf,
+    source map), based on its name and header.
+    """
+    if file_name in GENERATED_FILE_NAMES:
+        return True
+    if any(fnmatch.fnmatch(file_name, pattern) for pattern in GENERATED_FILE_PATTERNS):
+        return True
+
+    # Generators place the marker at the very top of the file
+    return GENERATED_HEADER_PATTERN.search(head[:1024]) is not None
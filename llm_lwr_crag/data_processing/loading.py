@@ -1,36 +1,112 @@
+import codecs
+import hashlib
+import io
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
-from typing import List, Union
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from box import Box
 from langchain.schema import Document
+from utils.const import DEFAULT_ARGS
+from utils.hashing import hash_text
+from utils.logging import logger
+from utils.stream import batched
 
-from .metadata import add_doc_metadata
+from .file_filters import HEAD_SIZE, is_binary, is_generated, is_minified
+from .metadata import add_doc_metadata, iter_llm_metadata, local_metadata_args
+from .walker import walk_repo
 
 
-def extract_text(file_path: Path) -> str:
+def extract_text(file_path: Path, skip_generated: bool = False) -> str:
     """
     Try extracting the text from the file at `file_path` (local).
+    Binary files are skipped.
 
     Args:
         file_path (Path): Path to a local file.
+        skip_generated (bool): If True, skip minified and generated files as well.
 
     Returns:
-        str: Textual content of given file.
+        str: Textual content of given file. Empty, if the file is skipped.
     """
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
+        with open(file_path, "rb") as f:
+            head = f.read(HEAD_SIZE)
+            if is_binary(head):
+                return ""
+            if skip_generated and (
+                is_generated(file_path.name, head)
+                or is_minified(file_path.suffix, head)
+            ):
+                return ""
+
+            f.seek(0)
+            with io.TextIOWrapper(f, encoding="utf-8", errors="ignore") as text_f:
+                return text_f.read()
     except Exception:
         return ""
 
 
+def iter_text_windows(file_path: Path, window_size: int) -> Iterator[str]:
+    """
+    Read the text of the file at `file_path` (local) window by window, so that
+    at most (about) `window_size` bytes are held in memory at once.
+    Windows are cut at line boundaries, whenever possible.
+
+    Args:
+        file_path (Path): Path to a local file.
+        window_size (int): Maximum number of bytes read into a window (a
+            character split between two windows is decoded whole, within the
+            latter one).
+
+    Returns:
+        Iterator[str]: Consecutive windows of the file's text.
+    """
+    # Windows are decoded as a single stream, so characters (and line endings)
+    # split between two windows are decoded as if the file was read at once
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="ignore"), translate=True
+    )
+    with open(file_path, "rb") as f:
+        rest = b""
+        while block := f.read(window_size - len(rest)):
+            window = rest + block
+            cut = window.rfind(b"\n") + 1
+            if cut == 0 or len(window) < window_size:
+                cut = len(window)
+            window, rest = window[:cut], window[cut:]
+            if text := decoder.decode(window):
+                yield text
+        if text := decoder.decode(rest, final=True):
+            yield text
+
+
 def process_file(
     file_path: Path,
     repo_dir: Path,
-    extensions: List[str],
+    extensions: Collection[str],
     metadata_args: Box,
+    skip_generated: bool = False,
 ) -> Union[None, Document]:
     """
     Processes files by loading their content and appending the relevant
@@ -39,7 +115,8 @@ def process_file(
     Args:
         file_path (Path): Path to the file to process.
         repo_dir (Path): Root to the repo directory - useful for path construction.
-        extensions (List[str]): List of valid extensions to use.
+        extensions (Collection[str]): Valid extensions to use.
+        skip_generated (bool): If True, skip minified and generated files.
     Returns:
         Union[None, Document]: Processed file as a Document, if valid.
             Otherwise, will return None.
@@ -56,7 +133,7 @@ def process_file(
         return None
 
     # Extract text, and, if present, construct the file with relevant metadata
-    text = extract_text(file_path)
+    text = extract_text(file_path, skip_generated)
     if text:
         doc = Document(
             page_content=text,
@@ -64,6 +141,8 @@ def process_file(
                 "rel_path": os.path.relpath(file_path, repo_dir),
                 "abs_path": str(file_path),
                 "ext": file_path.suffix,
+                # Hash of the raw content, prior to adding any metadata
+                "hash": hash_text(text),
             },
         )
         add_doc_metadata(doc, metadata_args)
@@ -72,41 +151,347 @@ def process_file(
     return None
 
 
+def process_large_file(
+    file_path: Path,
+    repo_dir: Path,
+    metadata_args: Box,
+    window_size: int,
+    skip_generated: bool = False,
+) -> Iterator[Document]:
+    """
+    Process a large file window by window, yielding a Document per window, so
+    the whole file is never held in memory.
+    All the windows share the hash of the complete file's content.
+
+    Args:
+        file_path (Path): Path to the file to process.
+        repo_dir (Path): Root to the repo directory - useful for path construction.
+        metadata_args (Box)
+        window_size (int): Maximum number of bytes within a window.
+        skip_generated (bool): If True, skip minified and generated files.
+
+    Returns:
+        Iterator[Document]: Windows of the processed file, as Documents.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(HEAD_SIZE)
+        if is_binary(head) or (
+            skip_generated
+            and (
+                is_generated(file_path.name, head)
+                or is_minified(file_path.suffix, head)
+            )
+        ):
+            return
+
+        # Hash the content in the first pass, same as `utils.hashing.hash_text`
+        hasher = hashlib.sha256()
+        for window in iter_text_windows(file_path, window_size):
+            hasher.update(window.encode("utf-8", errors="ignore"))
+        file_hash = hasher.hexdigest()
+
+        for i, window in enumerate(iter_text_windows(file_path, window_size)):
+            doc = Document(
+                page_content=window,
+                metadata={
+                    "rel_path": os.path.relpath(file_path, repo_dir),
+                    "abs_path": str(file_path),
+                    "ext": file_path.suffix,
+                    "hash": file_hash,
+                    "window": i,
+                },
+            )
+            add_doc_metadata(doc, metadata_args)
+            yield doc
+    except OSError:
+        return
+
+
+def split_by_size(
+    file_paths: Iterable[Path], loading_args: Box, large_file_paths: List[Path]
+) -> Iterator[Path]:
+    """
+    Filter out the files larger than `loading_args.max_file_size`, and set
+    aside the files larger than `loading_args.window_size`, to be loaded
+    window by window.
+
+    Args:
+        file_paths (Iterable[Path]): Paths to the files to load.
+        loading_args (Box)
+        large_file_paths (List[Path]): List to collect large files into.
+
+    Returns:
+        Iterator[Path]: Paths to the files small enough to be loaded at once.
+    """
+    for fp in file_paths:
+        try:
+            size = fp.stat().st_size
+        except OSError:
+            continue
+
+        if loading_args.max_file_size and size > loading_args.max_file_size:
+            continue
+        if loading_args.window_size and size > loading_args.window_size:
+            large_file_paths.append(fp)
+            continue
+
+        yield fp
+
+
+def process_files(
+    file_paths: List[Path],
+    repo_dir: Path,
+    extensions: Collection[str],
+    metadata_args: Box,
+    skip_generated: bool = False,
+) -> List[Document]:
+    """
+    Process a batch of files. Used as a single task of the process pool, so the
+    inter-process communication overhead is shared across the whole batch.
+
+    Args:
+        file_paths (List[Path]): Paths to the files to process.
+        repo_dir (Path): Root to the repo directory - useful for path construction.
+        extensions (Collection[str]): Valid extensions to use.
+        metadata_args (Box)
+        skip_generated (bool): If True, skip minified and generated files.
+
+    Returns:
+        List[Document]: Valid processed files, as Documents.
+    """
+    docs = [
+        process_file(fp, repo_dir, extensions, metadata_args, skip_generated)
+        for fp in file_paths
+    ]
+    return [doc for doc in docs if doc]
+
+
+def iter_completed(
+    executor: Executor,
+    tasks: Iterable[Tuple[Callable, tuple]],
+    max_pending: int,
+) -> Iterator[Any]:
+    """
+    Submit tasks to the executor and yield their results as they complete.
+    At most `max_pending` tasks are submitted at once, so tasks are generated
+    lazily and results do not pile up.
+
+    Args:
+        executor (Executor): Executor to submit the tasks to.
+        tasks (Iterable[Tuple[Callable, tuple]]): Pairs of function and its
+            positional arguments.
+        max_pending (int): Maximum number of submitted, unfinished tasks.
+
+    Returns:
+        Iterator[Any]: Results of the tasks, in order of completion.
+    """
+    pending: set = set()
+    for func, func_args in tasks:
+        # Wait for some of the tasks to finish, before submitting new ones
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        pending.add(executor.submit(func, *func_args))
+
+    for future in as_completed(pending):
+        yield future.result()
+
+
+def iter_small_docs(
+    file_paths: Iterable[Path],
+    repo_dir: Path,
+    extensions: Collection[str],
+    metadata_args: Box,
+    loading_args: Box,
+) -> Iterator[Document]:
+    """
+    Load the given files in parallel, either in a thread, or in a process pool
+    (depending on `loading_args.executor`).
+    Check `iter_docs` for details.
+    """
+    skip_generated = loading_args.skip_generated
+
+    if loading_args.executor == "thread":
+        with ThreadPoolExecutor(max_workers=loading_args.num_workers) as executor:
+            tasks: Iterator[Tuple[Callable, tuple]] = (
+                (
+                    process_file,
+                    (fp, repo_dir, extensions, metadata_args, skip_generated),
+                )
+                for fp in file_paths
+            )
+            for doc in iter_completed(executor, tasks, loading_args.queue_size):
+                if doc:
+                    yield doc
+        return
+
+    chunksize = loading_args.process_chunksize
+    with ProcessPoolExecutor(max_workers=loading_args.num_workers) as executor:
+        tasks = (
+            (
+                process_files,
+                (batch, repo_dir, extensions, metadata_args, skip_generated),
+            )
+            for batch in batched(file_paths, chunksize)
+        )
+        max_pending = max(1, loading_args.queue_size // chunksize)
+        for docs in iter_completed(executor, tasks, max_pending):
+            yield from docs
+
+
+def iter_loaded_docs(
+    repo_dir: Path,
+    extensions: Collection[str],
+    metadata_args: Box,
+    loading_args: Box,
+) -> Iterator[Document]:
+    """
+    Lazily load documents from given directory, generating only the LLM-free
+    metadata (e.g. code structure) listed before any LLM-based piece. Check
+    `iter_docs` for details.
+    """
+    metadata_args = local_metadata_args(metadata_args)
+
+    large_file_paths: List[Path] = []
+    file_paths = split_by_size(
+        walk_repo(
+            repo_dir,
+            extensions,
+            exclude=loading_args.exclude,
+            gitignore=loading_args.gitignore,
+        ),
+        loading_args,
+        large_file_paths,
+    )
+    skip_generated = loading_args.skip_generated
+
+    yield from iter_small_docs(
+        file_paths, repo_dir, extensions, metadata_args, loading_args
+    )
+
+    for fp in large_file_paths:
+        yield from process_large_file(
+            fp, repo_dir, metadata_args, loading_args.window_size, skip_generated
+        )
+
+
+def iter_docs(
+    repo_dir: Path,
+    extensions: Collection[str],
+    metadata_args: Box,
+    loading_args: Optional[Box] = None,
+) -> Iterator[Document]:
+    """
+    Lazily load documents from given directory.
+    Files are processed in parallel, but at most `loading_args.queue_size` of
+    them are submitted at once, so the directory walk and the loading progress
+    together and memory stays bounded. Documents are yielded as soon as they
+    are loaded.
+
+    By default, files are processed in a thread pool. With the "process"
+    executor, reading the files and generating LLM-free metadata (e.g. code
+    structure), which is CPU-bound, are done in a process pool instead, in
+    batches of `loading_args.process_chunksize` files.
+    LLM-based metadata (e.g. LLM summary), and any pieces listed after it, is
+    generated afterwards, in a separate stage, for batches of loaded documents
+    at once. Pieces of metadata are always generated in the configured order.
+
+    Files larger than `loading_args.max_file_size` are skipped, while files
+    larger than `loading_args.window_size` are loaded last, window by window.
+
+    Args:
+        repo_dir (Path): Path to local directory, containing the downloaded
+            GitHub repository.
+        extensions (Collection[str]): Allowed extensions to load.
+            Otherwise, simply skip the document.
+        metadata_args (Box)
+        loading_args (Optional[Box]): If not provided, default loading
+            arguments are used.
+
+    Returns:
+        Iterator[Document]: Loaded documents, in order of completion.
+    """
+    if loading_args is None:
+        loading_args = DEFAULT_ARGS.retriever.loading
+
+    yield from iter_llm_metadata(
+        iter_loaded_docs(repo_dir, extensions, metadata_args, loading_args),
+        metadata_args,
+    )
+
+
+def dedup_docs(docs: List[Document]) -> List[Document]:
+    """
+    Keep a single document per unique content (blob), so identical files
+    (vendored copies, duplicated fixtures, ...) are chunked and embedded once.
+    Representative document is the one with the lexicographically smallest
+    path, while the paths of its duplicates are stored in its metadata, as a
+    newline-separated `aliases` string (check `utils.aliases.chunk_fps`).
+
+    Args:
+        docs (List[Document]): List of loaded documents.
+
+    Returns:
+        List[Document]: List of unique documents.
+    """
+    blobs: Dict[Tuple[str, Optional[int]], List[Document]] = defaultdict(list)
+    for doc in docs:
+        # Windows of the same large file share the hash of the complete file
+        blobs[(doc.metadata["hash"], doc.metadata.get("window"))].append(doc)
+
+    unique_docs = []
+    for blob_docs in blobs.values():
+        blob_docs.sort(key=lambda doc: doc.metadata["rel_path"])
+        representative = blob_docs[0]
+        if len(blob_docs) > 1:
+            representative.metadata["aliases"] = "\n".join(
+                doc.metadata["rel_path"] for doc in blob_docs[1:]
+            )
+        unique_docs.append(representative)
+
+    if len(unique_docs) < len(docs):
+        logger.info(
+            f"Deduplicated {len(docs)} documents into {len(unique_docs)} unique ones."
+        )
+
+    return unique_docs
+
+
 def load_docs(
-    repo_dir: Path, extensions: List[str], metadata_args: Box
+    repo_dir: Path,
+    extensions: Collection[str],
+    metadata_args: Box,
+    loading_args: Optional[Box] = None,
 ) -> List[Document]:
     """
     Load documents from given directory.
-    Only include documents whose extension is within `extensions` list.
+    Only include documents whose extension is within `extensions`.
     Processes files in parallel, for quicker loading.
+    Identical files are loaded only once, if `loading_args.dedup` is set.
 
     Args:
         repo_dir (Path): Path to local directory, containing the downloaded
             GitHub repository.
-        extensions (List[str]): List of allowed extensions to load.
+        extensions (Collection[str]): Allowed extensions to load.
             Otherwise, simply skip the document.
         metadata_args (Box)
+        loading_args (Optional[Box]): If not provided, default loading
+            arguments are used.
 
     Returns:
          docs (List[Document]): List of loaded documents, with their content
             and other relevant metadata loaded into `langchain.schema.Document`
             object.
     """
-    docs = []
-    file_paths = [
-        Path(root) / file for root, _, files in os.walk(repo_dir) for file in files
-    ]
-
-    # Process files in parallel
-    with ThreadPoolExecutor() as executor:
-        future_to_file = {
-            executor.submit(process_file, fp, repo_dir, extensions, metadata_args): fp
-            for fp in file_paths
-        }
+    if loading_args is None:
+        loading_args = DEFAULT_ARGS.retriever.loading
 
-        for future in as_completed(future_to_file):
-            doc = future.result()
-            if doc:
-                docs.append(doc)
+    docs = list(iter_loaded_docs(repo_dir, extensions, metadata_args, loading_args))
+    if loading_args.dedup:
+        docs = dedup_docs(docs)
 
-    return docs
+    # Generate LLM-based metadata only once per unique document
+    return list(iter_llm_metadata(docs, metadata_args))
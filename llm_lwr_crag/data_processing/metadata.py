@@ -1,8 +1,13 @@
-from typing import List, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 from box import Box
 from handlers.auto import AutoLLM
 from langchain.schema import Document
+from utils.disk_cache import DiskCache, cache_key
+from utils.path import path
+from utils.stream import batched
 
 from .codeparser import CodeParser
 
@@ -11,34 +16,82 @@ from .codeparser import CodeParser
 llm_summary = None
 llm_augment = None
 
+# Persistent caches of generated summaries and augmented queries
+summary_cache = None
+augment_cache = None
 
-def gen_summary(doc: Document, metadata_args: Box) -> None:
+# Documents are processed within a thread pool - instantiate the globals once
+init_lock = threading.Lock()
+
+
+def gen_summary(docs: Union[Document, List[Document]], metadata_args: Box) -> None:
     """
-    Generate LLM summary for the given document.
+    Generate LLM summary for the given documents.
+    In case of a single document passed, format it into a list, for easier
+    implementation.
+    Summaries are cached on disk, so the LLM is called only for new (or
+    modified) documents. Summaries of all the uncached documents are generated
+    in a single batch (concurrently, as allowed by the LLM handler).
     Modifies document metadata and content in-place.
     Content is modified by prepending the summary to the original content.
 
     Args:
-        doc (Document): Document to generate LLM summary of.
+        docs (Union[Document, List[Document]]): Document(s) to generate LLM
+            summary of.
         metadata_args (Box)
 
     Returns:
         None
     """
+    if isinstance(docs, Document):
+        docs = [docs]
+
     # Check whether it is the first time instantiating the LLM for summary
     # If so, instantiate it and keep it cached
-    global llm_summary
-    if llm_summary is None:
-        llm_summary_args = metadata_args.llm_summary
-        llm_summary = AutoLLM.from_args(llm_summary_args)
+    global llm_summary, summary_cache
+    with init_lock:
+        if llm_summary is None:
+            llm_summary_args = metadata_args.llm_summary
+            llm_summary = AutoLLM.from_args(llm_summary_args)
+        if summary_cache is None and metadata_args.summary_cache_path:
+            summary_cache = DiskCache(
+                path(metadata_args.summary_cache_path),
+                max_size=metadata_args.summary_cache_max_size,
+            )
+
+    # Summaries are addressed by everything the prompt is made of
+    keys = [
+        cache_key(
+            str(llm_summary),
+            llm_summary.summarize_msg,
+            doc.page_content,
+            doc.metadata["rel_path"],
+            doc.metadata["ext"],
+        )
+        for doc in docs
+    ]
+    summaries: List[Optional[str]] = [
+        summary_cache.get(key) if summary_cache is not None else None for key in keys
+    ]
+
+    todo = [idx for idx, summary in enumerate(summaries) if summary is None]
+    if todo:
+        new_summaries = llm_summary.gen_summaries([docs[idx] for idx in todo])
+        for idx, new_summary in zip(todo, new_summaries):
+            summaries[idx] = new_summary
+            if summary_cache is not None:
+                summary_cache.set(keys[idx], new_summary)
 
     # Add summary to metadata and move it to content
-    doc.metadata["llm_summary"] = llm_summary.gen_summary(doc)
-    doc.page_content = (
-        f"LLM Summary: {doc.metadata['llm_summary']}"
-        "\n\n"
-        f"Content: {doc.page_content}"
-    )
+    for doc, summary in zip(docs, summaries):
+        if summary is None:
+            raise RuntimeError(f"No summary generated for {doc.metadata['rel_path']}")
+        doc.metadata["llm_summary"] = summary
+        doc.page_content = (
+            f"LLM Summary: {doc.metadata['llm_summary']}"
+            "\n\n"
+            f"Content: {doc.page_content}"
+        )
 
 
 def gen_code_structure(
@@ -64,12 +117,18 @@ def gen_code_structure(
         docs = [docs]
 
     for doc in docs:
-        functions, classes = CodeParser.parse_code(
+        symbols = CodeParser.parse_symbols(
             doc.page_content,
             doc.metadata["ext"],
+            max_size=metadata_args.code_structure_max_size,
+            time_budget=metadata_args.code_structure_time_budget,
+        )
+        doc.metadata["functions"] = ", ".join(
+            [sym.name for sym in symbols if sym.kind == "function"]
+        )
+        doc.metadata["classes"] = ", ".join(
+            [sym.name for sym in symbols if sym.kind == "class"]
         )
-        doc.metadata["functions"] = ", ".join([fp for f in functions for fp in f])
-        doc.metadata["classes"] = ", ".join([fclp for cl in classes for fclp in cl])
 
         doc.page_content = (
             f"Functions: {doc.metadata['functions']}"
@@ -83,6 +142,8 @@ def gen_code_structure(
 def augment_query(query: str, metadata_args: Box) -> str:
     """
     Use an LLM to augment given query, for better retrieval.
+    Augmented queries are cached on disk, so repeated queries (e.g. of the
+    same evaluation dataset) do not call the LLM again.
 
     Args:
         query (str): Query to augment with keywords and relevant file names.
@@ -91,15 +152,51 @@ def augment_query(query: str, metadata_args: Box) -> str:
     Returns:
         str: Augmented query.
     """
-    # Check whether it is the first time instantiating the LLM for summary
+    # Check whether it is the first time instantiating the LLM for augmentation
     # If so, instantiate it and keep it cached
-    global llm_augment
-    if llm_augment is None:
-        llm_augment_args = metadata_args.augment_query
-        llm_augment = AutoLLM.from_args(llm_augment_args)
+    global llm_augment, augment_cache
+    with init_lock:
+        if llm_augment is None:
+            llm_augment_args = metadata_args.augment_query
+            llm_augment = AutoLLM.from_args(llm_augment_args)
+        if augment_cache is None and metadata_args.augment_cache_path:
+            augment_cache = DiskCache(path(metadata_args.augment_cache_path))
+
+    key = cache_key(str(llm_augment), llm_augment.augment_msg, query)
+    aug_query = augment_cache.get(key) if augment_cache is not None else None
+    if aug_query is None:
+        # Augment the query
+        aug_query = llm_augment.augment(query)
+        if augment_cache is not None:
+            augment_cache.set(key, aug_query)
+
+    return aug_query
+
+
+def augment_queries(queries: List[str], metadata_args: Box) -> List[str]:
+    """
+    Augment the given queries concurrently, using `metadata_args.num_workers`
+    threads. Each unique query is augmented only once.
+
+    Args:
+        queries (List[str]): Queries to augment.
+        metadata_args (Box)
+
+    Returns:
+        List[str]: Augmented queries, in the original order.
+    """
+    unique_queries = list(dict.fromkeys(queries))
+    with ThreadPoolExecutor(max_workers=metadata_args.num_workers) as executor:
+        aug_queries = dict(
+            zip(
+                unique_queries,
+                executor.map(
+                    lambda query: augment_query(query, metadata_args), unique_queries
+                ),
+            )
+        )
 
-    # Augment the query
-    return llm_augment.augment(query)
+    return [aug_queries[query] for query in queries]
 
 
 # Metadata piece to function mapping
@@ -108,8 +205,88 @@ MD_PC_TO_FUNC = {
     "llm_summary": gen_summary,
 }
 
+# Metadata pieces generated without any LLM, i.e. safe to generate within
+# worker processes. Pieces following the first LLM piece are generated in a
+# separate stage, in batches of documents (check `iter_llm_metadata`)
+LOCAL_MD_PCS = {"code_structure"}
+
+
+def split_md_pcs(md_pcs: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split the pieces of metadata into the ones generated while loading the
+    documents - the LLM-free pieces listed before any LLM piece - and the ones
+    generated afterwards. Each piece modifies the content the following ones
+    see, so pieces keep their configured order.
+
+    Args:
+        md_pcs (List[str]): Pieces of metadata, in the configured order.
+
+    Returns:
+        Tuple[List[str], List[str]]: Pieces generated while loading, and the
+            remaining ones.
+    """
+    num_local = 0
+    while num_local < len(md_pcs) and md_pcs[num_local] in LOCAL_MD_PCS:
+        num_local += 1
+    return md_pcs[:num_local], md_pcs[num_local:]
+
 
-def add_doc_metadata(doc: Document, metadata_args: Box) -> None:
+def local_metadata_args(metadata_args: Box) -> Box:
+    """
+    Restrict the metadata arguments to the pieces of metadata generated while
+    loading the documents (check `split_md_pcs`).
+    """
+    if metadata_args is None:
+        return metadata_args
+
+    return Box(
+        {
+            **metadata_args,
+            "list": split_md_pcs(metadata_args.list)[0],
+        }
+    )
+
+
+def iter_llm_metadata(
+    docs: Iterable[Document], metadata_args: Optional[Box]
+) -> Iterator[Document]:
+    """
+    Generate LLM-based pieces of metadata (and any pieces listed after them)
+    for the stream of documents, in the configured order.
+    Documents are grouped into batches of `metadata_args.batch_size`, and each
+    piece is generated for the whole batch at once, using a single model
+    instance.
+
+    Args:
+        docs (Iterable[Document]): Documents, with the pieces of metadata
+            generated while loading (check `split_md_pcs`).
+        metadata_args (Optional[Box])
+
+    Returns:
+        Iterator[Document]: Documents with all the metadata, in the original
+            order.
+    """
+    md_pcs = []
+    if metadata_args is not None:
+        md_pcs = split_md_pcs(metadata_args.list)[1]
+
+    if metadata_args is None or not md_pcs:
+        yield from docs
+        return
+
+    for batch in batched(docs, metadata_args.batch_size):
+        for md_pc in md_pcs:
+            md_gen_func = MD_PC_TO_FUNC.get(md_pc, None)
+            if md_gen_func is None:
+                raise ValueError(f"Invalid piece of metadata requested: {md_pc}")
+
+            md_gen_func(batch, metadata_args)
+        yield from batch
+
+
+def add_doc_metadata(
+    doc: Document, metadata_args: Box, md_pcs: Optional[Iterable[str]] = None
+) -> None:
     """
     Augment the document with pieces of metadata.
     Each metadata piece is mapped to a relevant function, used for its generation.
@@ -117,6 +294,8 @@ def add_doc_metadata(doc: Document, metadata_args: Box) -> None:
     Args:
         doc (Document): Document whose metadata to enrich.
         metadata_args (Box)
+        md_pcs (Optional[Iterable[str]]): Pieces of metadata to generate.
+            Defaults to all pieces listed in `metadata_args`.
 
     Returns:
         None
@@ -124,7 +303,10 @@ def add_doc_metadata(doc: Document, metadata_args: Box) -> None:
     if metadata_args is None:
         return
 
-    for md_pc in metadata_args.list:
+    if md_pcs is None:
+        md_pcs = metadata_args.list
+
+    for md_pc in md_pcs:
         md_gen_func = MD_PC_TO_FUNC.get(md_pc, None)
         if md_gen_func is None:
             raise ValueError(f"Invalid piece of metadata requested: {md_pc}")
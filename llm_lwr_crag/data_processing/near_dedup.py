@@ -0,0 +1,151 @@
+import zlib
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+from utils.aliases import chunk_fps
+from utils.chunk_store import ChunkStore
+from utils.logging import logger
+
+__all__ = ["MinHashLSH", "dedup_chunks"]
+
+# Mersenne prime used for the universal hashing of the shingles
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """
+    Near-duplicate detector based on MinHash signatures and LSH banding.
+
+    Texts are represented by the sets of their (word-level) shingles. Two texts
+    whose signatures agree on all the rows of any band become candidates, and
+    are considered duplicates if their estimated Jaccard similarity is at least
+    `threshold`. Only candidates are compared, so detection takes time roughly
+    linear in the number of texts.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        num_bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 42,
+    ):
+        if num_perm % num_bands:
+            raise ValueError("`num_perm` must be divisible by `num_bands`.")
+
+        self.threshold = threshold
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.buckets: List[Dict[bytes, List[int]]] = [
+            defaultdict(list) for _ in range(num_bands)
+        ]
+        self.signatures: Dict[int, np.ndarray] = {}
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        Hash the word-level shingles of the text (whitespace is normalized).
+        """
+        tokens = text.split()
+        size = min(self.shingle_size, len(tokens)) or 1
+        hashes = {
+            zlib.crc32(" ".join(tokens[start:end]).encode("utf-8"))
+            for start, end in zip(range(len(tokens)), range(size, len(tokens) + 1))
+        } or {0}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of the text.
+        """
+        hashes = self.shingles(text) % MERSENNE_PRIME
+        # (num_shingles, num_perm) - products fit into 64 bits, as both
+        # factors are below 2^31
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.num_bands, -1)]
+
+    def query(self, signature: np.ndarray) -> int:
+        """
+        Find a stored text, near-duplicate of the one with given signature.
+
+        Returns:
+            int: Key of the most similar stored text, or -1 if there is none.
+        """
+        candidates = {
+            key
+            for band, band_key in enumerate(self.band_keys(signature))
+            for key in self.buckets[band].get(band_key, [])
+        }
+
+        best_key, best_similarity = -1, self.threshold
+        for key in sorted(candidates):
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
+
+    def insert(self, key: int, signature: np.ndarray) -> None:
+        self.signatures[key] = signature
+        for band, band_key in enumerate(self.band_keys(signature)):
+            self.buckets[band][band_key].append(key)
+
+
+def dedup_chunks(chunks: ChunkStore, threshold: float = 0.9) -> ChunkStore:
+    """
+    Drop near-duplicate chunks (license headers, repeated imports, copy-pasted
+    blocks, ...), so they are embedded and indexed only once.
+    First occurrence is kept as the representative, while the paths of the
+    files its duplicates come from are added to its (newline-separated)
+    `near_duplicates` metadata. Unlike the `aliases` of identical files, they
+    are not retrieved alongside the representative, as only its content is
+    (nearly) the same.
+
+    Args:
+        chunks (ChunkStore): Chunks to deduplicate.
+        threshold (float): Minimum (estimated) Jaccard similarity of the
+            shingles of two chunks, for them to be considered duplicates.
+
+    Returns:
+        ChunkStore: Unique chunks, in the original order.
+    """
+    lsh = MinHashLSH(threshold=threshold)
+    unique_idxs: List[int] = []
+    # Used as ordered sets
+    near_duplicates: Dict[int, Dict[str, None]] = defaultdict(dict)
+
+    for idx in range(len(chunks)):
+        signature = lsh.signature(chunks.text(idx))
+        rep_idx = lsh.query(signature)
+        if rep_idx == -1:
+            lsh.insert(idx, signature)
+            unique_idxs.append(idx)
+            continue
+
+        # Include the paths of files deduplicated during loading as well
+        for fp in chunk_fps(chunks[idx]):
+            near_duplicates[rep_idx][fp] = None
+
+    for rep_idx, rep_near_duplicates in near_duplicates.items():
+        rep_fps = chunk_fps(chunks[rep_idx])
+        fps = [fp for fp in rep_near_duplicates if fp not in rep_fps]
+        if fps:
+            chunks.set_metadata(rep_idx, "near_duplicates", "\n".join(fps))
+
+    if len(unique_idxs) == len(chunks):
+        return chunks
+
+    logger.info(
+        f"Removed {len(chunks) - len(unique_idxs)} near-duplicate chunks, "
+        f"{len(unique_idxs)} unique chunks left."
+    )
+    return chunks.subset(unique_idxs)
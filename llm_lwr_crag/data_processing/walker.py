@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+from typing import Collection, Iterator, List, Optional, Tuple
+
+from pathspec import GitIgnoreSpec
+
+__all__ = ["walk_repo"]
+
+# Specs of `.gitignore` files in effect, each paired with the (relative) path
+# of the directory it is located in
+IgnoreSpecs = List[Tuple[str, GitIgnoreSpec]]
+
+
+def load_gitignore(dir_path: str) -> Optional[GitIgnoreSpec]:
+    """
+    Load `.gitignore` file from the given directory, if present.
+
+    Args:
+        dir_path (str): Path to the directory.
+
+    Returns:
+        Optional[GitIgnoreSpec]: Compiled `.gitignore` patterns, or None if there
+            is no `.gitignore` file in the directory.
+    """
+    try:
+        with open(
+            os.path.join(dir_path, ".gitignore"), "r", encoding="utf-8", errors="ignore"
+        ) as file:
+            return GitIgnoreSpec.from_lines(file)
+    except OSError:
+        return None
+
+
+def is_ignored(rel_path: str, ignore_specs: IgnoreSpecs) -> bool:
+    """
+    Check whether the path is ignored by the `.gitignore` files in effect.
+    Deeper `.gitignore` files take precedence, same as in git.
+
+    Args:
+        rel_path (str): Path relative to the repository root. Directories must
+            end with a trailing "/".
+        ignore_specs (IgnoreSpecs): `.gitignore` files in effect, ordered from
+            the repository root downwards.
+
+    Returns:
+        bool: True if the path is ignored.
+    """
+    ignored = False
+    for base_dir, spec in ignore_specs:
+        include = spec.check_file(rel_path.removeprefix(base_dir)).include
+        if include is not None:
+            ignored = include
+    return ignored
+
+
+def walk_repo(
+    repo_dir: Path,
+    extensions: Collection[str],
+    exclude: Optional[List[str]] = None,
+    gitignore: bool = True,
+) -> Iterator[Path]:
+    """
+    Walk the repository and yield paths of files worth loading.
+    Excluded and ignored directories are pruned before being entered, and
+    file extensions are checked directly on the directory entries, before
+    any path object is created.
+
+    Args:
+        repo_dir (Path): Path to local directory, containing the downloaded
+            GitHub repository.
+        extensions (Collection[str]): Allowed extensions. Files without an
+            extension are matched by their full name (e.g. LICENSE).
+        exclude (Optional[List[str]]): Additional patterns to exclude, in
+            `.gitignore` syntax (e.g. "node_modules/", "*.min.js").
+        gitignore (bool): If True, honour `.gitignore` files in the repository.
+
+    Returns:
+        Iterator[Path]: Paths to files to load.
+    """
+    exclude_specs: IgnoreSpecs = (
+        [("", GitIgnoreSpec.from_lines(exclude))] if exclude else []
+    )
+
+    # Directories to visit: (absolute path, relative path, `.gitignore` specs)
+    stack: List[Tuple[str, str, IgnoreSpecs]] = [(str(repo_dir), "", [])]
+    while stack:
+        dir_path, rel_dir, ignore_specs = stack.pop()
+
+        if gitignore:
+            spec = load_gitignore(dir_path)
+            if spec is not None:
+                ignore_specs = ignore_specs + [(rel_dir, spec)]
+
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            continue
+
+        subdirs = []
+        with entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+
+                if is_dir:
+                    rel_path = f"{rel_dir}{entry.name}/"
+                    if not (
+                        is_ignored(rel_path, exclude_specs)
+                        or is_ignored(rel_path, ignore_specs)
+                    ):
+                        subdirs.append((entry.path, rel_path, ignore_specs))
+                    continue
+
+                # Same as `Path.suffix`, falling back to the full filename
+                ext = os.path.splitext(entry.name)[1] or entry.name
+                if ext not in extensions:
+                    continue
+
+                rel_path = f"{rel_dir}{entry.name}"
+                if is_ignored(rel_path, exclude_specs) or is_ignored(
+                    rel_path, ignore_specs
+                ):
+                    continue
+
+                yield Path(entry.path)
+
+        # Visit subdirectories in the order they were listed
+        stack += reversed(subdirs)
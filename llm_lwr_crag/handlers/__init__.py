@@ -1,5 +1,12 @@
 from .auto import AutoDB, AutoLLM
-from .db import AbstractDB
-from .llm import AbstractLLM
+from .db import AbstractDB, IndexManifest
+from .llm import AbstractLLM, RerankCascade
 
-__all__ = ["AbstractDB", "AbstractLLM", "AutoDB", "AutoLLM"]
+__all__ = [
+    "AbstractDB",
+    "AbstractLLM",
+    "AutoDB",
+    "AutoLLM",
+    "IndexManifest",
+    "RerankCascade",
+]
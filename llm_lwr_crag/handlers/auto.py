@@ -1,14 +1,18 @@
 from box import Box
 
 from .db import AbstractDB, BM25Handler, ChromaDBHandler, FAISSHandler
-from .llm import AbstractLLM, HFHandler, OpenAIHandler
+from .llm import AbstractLLM, AsyncOpenAIHandler, HFHandler, OpenAIHandler
 
 NAME_TO_DB_TYPE = {
     "chromadb": ChromaDBHandler,
     "faiss": FAISSHandler,
     "bm25": BM25Handler,
 }
-NAME_TO_LLM_TYPE = {"hf": HFHandler, "openai": OpenAIHandler}
+NAME_TO_LLM_TYPE = {
+    "hf": HFHandler,
+    "openai": OpenAIHandler,
+    "openai_async": AsyncOpenAIHandler,
+}
 
 
 class AutoDB:
@@ -2,10 +2,12 @@ from .abstract_db import AbstractDB
 from .bm25_handler import BM25Handler
 from .chroma_db_handler import ChromaDBHandler
 from .faiss_handler import FAISSHandler
+from .manifest import IndexManifest
 
 __all__ = [
     "AbstractDB",
     "ChromaDBHandler",
     "BM25Handler",
     "FAISSHandler",
+    "IndexManifest",
 ]
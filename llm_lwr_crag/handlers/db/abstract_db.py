@@ -1,8 +1,9 @@
 from abc import ABC
 from collections import defaultdict
-from typing import List, Set, Tuple
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
 from langchain.schema import Document
+from utils.aliases import chunk_fps
 
 
 class AbstractDB(ABC):
@@ -10,12 +11,32 @@ class AbstractDB(ABC):
     Abstract handler class for seamless integration with various databases.
     """
 
-    def add_documents(self, chunks: List[Document]) -> None:
+    def add_documents(
+        self, chunks: Sequence[Document], ids: Optional[List[str]] = None
+    ) -> None:
         """
         Store embeddings in the Chroma database.
         """
         pass
 
+    def delete(self, ids: List[str]) -> None:
+        """
+        Remove the chunks with given IDs from the database.
+        """
+        pass
+
+    def get_documents(self) -> List[Document]:
+        """
+        Fetch all the chunks stored within the database.
+        """
+        return []
+
+    def persist(self) -> None:
+        """
+        Save the database to local, if it is not persisted automatically.
+        """
+        pass
+
     def query(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
         """
         Query the Chroma database for files.
@@ -29,6 +50,7 @@ class AbstractDB(ABC):
     ) -> Tuple[List[str], List[Document]]:
         """
         Filter returned chunks by file paths. Take at most K unique file paths.
+        Chunks of deduplicated files count for all of their file paths.
 
         Args:
             all_ret_chunks (List[Document]): List of all retrieved chunks.
@@ -45,7 +67,10 @@ class AbstractDB(ABC):
             if len(ret_fps) >= top_k:
                 break
             ret_chunks.append(rc)
-            ret_fps.add(rc.metadata["rel_path"])
+            for fp in chunk_fps(rc):
+                if len(ret_fps) >= top_k:
+                    break
+                ret_fps.add(fp)
 
         return list(ret_fps), ret_chunks
 
@@ -131,12 +156,17 @@ class AbstractDB(ABC):
             ret_chunks (List[Document]): List of chunks matched from their
                 file paths.
         """
+        # Map each file path (including the ones of deduplicated files) to its
+        # first chunk
+        fp_to_chunk: Dict[str, Document] = {}
+        for ch in chunks:
+            for fp in chunk_fps(ch):
+                fp_to_chunk.setdefault(fp, ch)
+
         ret_chunks: List[Document] = []
         for fp in ret_fps:
-            chunks_with_fp = []
-            # TODO: Make this more pythonic
-            for ch in chunks:
-                if ch.metadata["rel_path"] == fp:
-                    chunks_with_fp.append(ch)
-            ret_chunks.append(chunks_with_fp[0])  # Append chunk with given fp
+            chunk = fp_to_chunk[fp]  # Append chunk with given fp
+            # Identical files share the chunk - include it only once
+            if not any(chunk is ch for ch in ret_chunks):
+                ret_chunks.append(chunk)
         return ret_chunks
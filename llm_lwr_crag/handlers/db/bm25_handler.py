@@ -1,8 +1,9 @@
-from typing import List, Tuple, Union
+from typing import List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from langchain.schema import Document
 from rank_bm25 import BM25Okapi
+from utils.chunk_store import ChunkStore
 from utils.logging import logger
 
 from .abstract_db import AbstractDB
@@ -11,6 +12,9 @@ from .abstract_db import AbstractDB
 class BM25Handler(AbstractDB):
     def __init__(self, args):
         self.db = None
+        self.docs = ChunkStore()
+        self.ids: List[Optional[str]] = []
+        self.tokenized_docs: List[List[str]] = []
 
     def __str__(self):
         return "BM25"
@@ -25,17 +29,54 @@ class BM25Handler(AbstractDB):
 
         return text.lower().split()
 
-    def add_documents(self, chunks: List[Document]) -> None:
-        if self.db is None:
-            logger.info("Building the BM25 index...")
+    def build(self) -> None:
+        """
+        (Re)build the BM25 index from the currently stored chunks.
+        BM25 statistics depend on the whole corpus, so the index cannot be
+        updated in-place.
+        """
+        logger.info("Building the BM25 index...")
+        self.db = BM25Okapi(self.tokenized_docs) if self.tokenized_docs else None
+        logger.info("Sucessfully created BM25 index from given files.")
+
+    def add_documents(
+        self, chunks: Sequence[Document], ids: Optional[List[str]] = None
+    ) -> None:
+        if not chunks:
+            return
 
-            tokenized_chunks = [self.tokenize(chunk) for chunk in chunks]
-            self.db = BM25Okapi(tokenized_chunks)
-            self.docs = chunks  # Used for future filtering purposes
+        num_docs = len(self.docs)
+        self.docs.extend(chunks)  # Used for future filtering purposes
+        if ids is None:
+            self.ids += [None] * len(chunks)
+        else:
+            self.ids += ids
+        self.tokenized_docs += [
+            self.tokenize(self.docs.text(idx))
+            for idx in range(num_docs, len(self.docs))
+        ]
+        self.build()
 
-            logger.info("Sucessfully created BM25 index from given files.")
+    def delete(self, ids: List[str]) -> None:
+        ids_to_delete = set(ids)
+        keep = [
+            i for i, chunk_id in enumerate(self.ids) if chunk_id not in ids_to_delete
+        ]
+        if len(keep) == len(self.ids):
+            return
+
+        self.docs = self.docs.subset(keep)
+        self.ids = [self.ids[i] for i in keep]
+        self.tokenized_docs = [self.tokenized_docs[i] for i in keep]
+        self.build()
+
+    def get_documents(self) -> List[Document]:
+        return self.docs
 
     def query(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        if self.db is None:
+            return []
+
         tok_query = self.tokenize(query)
         bm25_scores = self.db.get_scores(tok_query)
 
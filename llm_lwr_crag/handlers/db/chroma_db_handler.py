@@ -1,8 +1,9 @@
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 from langchain.schema import Document
 from langchain_chroma import Chroma
 from utils import logger, path
+
 from .abstract_db import AbstractDB
 
 
@@ -18,11 +19,30 @@ class ChromaDBHandler(AbstractDB):
     def __str__(self):
         return "ChromaDB"
 
-    def add_documents(self, chunks: List[Document]) -> None:
+    def add_documents(
+        self, chunks: Sequence[Document], ids: Optional[List[str]] = None
+    ) -> None:
+        if not chunks:
+            return
+
         logger.info(f"Adding embeddings into the {self.collection_name} (ChromeDB)...")
-        self.db.add_documents(chunks)
+        self.db.add_documents(chunks, ids=ids)
         logger.info("Sucessfully added embeddings into the database!")
 
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+
+        logger.info(f"Removing {len(ids)} chunks from the {self.collection_name}...")
+        self.db.delete(ids=ids)
+
+    def get_documents(self) -> List[Document]:
+        stored = self.db.get(include=["documents", "metadatas"])
+        return [
+            Document(page_content=content, metadata=metadata)
+            for content, metadata in zip(stored["documents"], stored["metadatas"])
+        ]
+
     def query(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
         ret_chunks = self.db.similarity_search(query, k=k)
         return ret_chunks
@@ -1,9 +1,11 @@
-from typing import List, Tuple
+import os
+from typing import List, Optional, Sequence, Tuple
 
 import faiss
 from langchain.schema import Document
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from utils import path
 from utils.logging import logger
 
 from .abstract_db import AbstractDB
@@ -13,6 +15,23 @@ class FAISSHandler(AbstractDB):
     def __init__(self, args):
         self.collection_name = args.collection_name
 
+        # FAISS index is kept in memory - it is only stored to (and loaded from)
+        # local when incremental indexing is used
+        self.persist_dir = None
+        if args.get("incremental", False):
+            self.persist_dir = str(path(args.persist_dir) / args.collection_name)
+
+        if self.persist_dir and os.path.exists(
+            os.path.join(self.persist_dir, "index.faiss")
+        ):
+            logger.info(f"Loading FAISS index from {self.persist_dir}...")
+            self.db = FAISS.load_local(
+                self.persist_dir,
+                embeddings=args.emb_func,
+                allow_dangerous_deserialization=True,
+            )
+            return
+
         index = faiss.IndexFlatL2(len(args.emb_func.embed_query("init")))
         self.db = FAISS(
             embedding_function=args.emb_func,
@@ -24,11 +43,39 @@ class FAISSHandler(AbstractDB):
     def __str__(self):
         return "FAISS"
 
-    def add_documents(self, chunks: List[Document]) -> None:
+    def add_documents(
+        self, chunks: Sequence[Document], ids: Optional[List[str]] = None
+    ) -> None:
+        if not chunks:
+            return
+
         logger.info(f"Adding embeddings into the {self.collection_name} (FAISS)...")
-        self.db.add_documents(chunks)
+        self.db.add_documents(chunks, ids=ids)
         logger.info("Successfully added embeddings into the FAISS database!")
 
+    def delete(self, ids: List[str]) -> None:
+        # FAISS raises an error on unknown IDs, therefore filter them out first
+        stored_ids = set(self.db.index_to_docstore_id.values())
+        ids = [chunk_id for chunk_id in ids if chunk_id in stored_ids]
+        if not ids:
+            return
+
+        logger.info(f"Removing {len(ids)} chunks from the {self.collection_name}...")
+        self.db.delete(ids)
+
+    def get_documents(self) -> List[Document]:
+        return [
+            self.db.docstore.search(chunk_id)
+            for chunk_id in self.db.index_to_docstore_id.values()
+        ]
+
+    def persist(self) -> None:
+        if self.persist_dir is None:
+            return
+
+        self.db.save_local(self.persist_dir)
+        logger.info(f"FAISS index saved to {self.persist_dir}")
+
     def query(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
         ret_chunks = self.db.similarity_search(query, k=k)
         return ret_chunks
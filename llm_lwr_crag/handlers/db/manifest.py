@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from box import Box
+from langchain.schema import Document
+from utils import logger, path
+
+__all__ = ["IndexManifest"]
+
+
+class IndexManifest:
+    """
+    Persisted mapping of file path -> (content hash, chunk IDs), stored next to
+    the index. Used for incremental re-indexing: only new or modified files are
+    re-chunked and re-embedded, while chunks of deleted files are removed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_path: Path, fingerprint: str = ""):
+        self.manifest_path = manifest_path
+        self.fingerprint = fingerprint
+        self.files: Dict[str, dict] = {}
+        self.outdated = False
+
+        if not os.path.exists(manifest_path):
+            return
+
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+
+        self.files = manifest.get("files", {})
+
+        # Different format, or a different chunking / metadata / embedding setup
+        # - every file has to be re-indexed
+        if (
+            manifest.get("version") != IndexManifest.VERSION
+            or manifest.get("fingerprint") != fingerprint
+        ):
+            logger.info("Index manifest is outdated, re-indexing all files.")
+            self.outdated = True
+
+    @staticmethod
+    def from_args(args: Box) -> "IndexManifest":
+        """
+        Create the manifest for the configured database.
+        Manifest is located in the database's `persist_dir`, and its fingerprint
+        is generated from the configuration parts affecting the chunk content.
+
+        Args:
+            args (Box): Complete (top-level) configuration.
+
+        Returns:
+            IndexManifest
+        """
+        db_args = args.retriever.db
+        manifest_path = (
+            path(db_args.persist_dir) / f"{db_args.collection_name}_manifest.json"
+        )
+
+        fingerprint_args = {
+            "metadata": args.retriever.get("metadata", None),
+            "chunking": args.retriever.chunking,
+            "llm": {
+                "provider": args.retriever.llm.provider,
+                "model_name": args.retriever.llm.model_name,
+            },
+            "db": db_args.provider,
+        }
+        fingerprint = hashlib.sha256(
+            json.dumps(fingerprint_args, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        return IndexManifest(manifest_path, fingerprint)
+
+    @staticmethod
+    def chunk_ids(chunks: Sequence[Document]) -> List[str]:
+        """
+        Generate deterministic chunk IDs, unique per file version.
+        Chunks are expected to be ordered within their own file.
+
+        Args:
+            chunks (Sequence[Document]): Chunks to generate IDs for.
+
+        Returns:
+            List[str]: ID of each chunk, in the same order.
+        """
+        ids = []
+        counters: Dict[str, int] = {}
+        for chunk in chunks:
+            rel_path = chunk.metadata["rel_path"]
+            idx = counters.get(rel_path, 0)
+            counters[rel_path] = idx + 1
+            ids.append(f"{rel_path}:{chunk.metadata['hash'][:16]}:{idx}")
+        return ids
+
+    def diff(self, docs: List[Document]) -> Tuple[List[Document], List[str]]:
+        """
+        Compare loaded documents against the manifest.
+
+        Args:
+            docs (List[Document]): Complete list of loaded documents.
+
+        Returns:
+            Tuple[List[Document], List[str]]: A tuple consisting of:
+                (1) changed_docs (List[Document]): New or modified documents.
+                (2) stale_fps (List[str]): File paths whose indexed chunks are
+                    outdated, i.e. modified or deleted files.
+        """
+        loaded_fps = set()
+        changed_docs = []
+        for doc in docs:
+            rel_path = doc.metadata["rel_path"]
+            loaded_fps.add(rel_path)
+
+            entry = self.files.get(rel_path, None)
+            if (
+                self.outdated
+                or entry is None
+                or entry["hash"] != doc.metadata["hash"]
+                # Set of identical (deduplicated) files has changed
+                or entry.get("aliases", "") != doc.metadata.get("aliases", "")
+            ):
+                changed_docs.append(doc)
+
+        changed_fps = {doc.metadata["rel_path"] for doc in changed_docs}
+        stale_fps = [
+            fp for fp in self.files if fp not in loaded_fps or fp in changed_fps
+        ]
+        return changed_docs, stale_fps
+
+    def stale_chunk_ids(self, stale_fps: List[str]) -> List[str]:
+        """
+        Collect IDs of the indexed chunks, belonging to the given file paths.
+        """
+        return [
+            chunk_id
+            for fp in stale_fps
+            if fp in self.files
+            for chunk_id in self.files[fp]["chunk_ids"]
+        ]
+
+    def update(
+        self,
+        stale_fps: List[str],
+        changed_docs: List[Document],
+        chunks: Sequence[Document],
+        chunk_ids: List[str],
+    ) -> None:
+        """
+        Drop the stale entries and register freshly indexed documents / chunks.
+
+        Args:
+            stale_fps (List[str]): File paths to remove from the manifest.
+            changed_docs (List[Document]): New or modified documents.
+            chunks (Sequence[Document]): Newly indexed chunks.
+            chunk_ids (List[str]): IDs of newly indexed chunks.
+        """
+        for fp in stale_fps:
+            self.files.pop(fp, None)
+
+        for doc in changed_docs:
+            self.files[doc.metadata["rel_path"]] = {
+                "hash": doc.metadata["hash"],
+                "aliases": doc.metadata.get("aliases", ""),
+                "chunk_ids": [],
+            }
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            self.files[chunk.metadata["rel_path"]]["chunk_ids"].append(chunk_id)
+
+        self.outdated = False
+
+    def save(self) -> None:
+        """
+        Persist the manifest to local.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+
+        # Write to a temporary file first, so an interrupted run cannot leave
+        # a corrupted manifest behind
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": IndexManifest.VERSION,
+                    "fingerprint": self.fingerprint,
+                    "files": self.files,
+                },
+                file,
+            )
+        os.replace(tmp_path, self.manifest_path)
+        logger.info(f"Index manifest saved to {self.manifest_path}")
@@ -1,5 +1,19 @@
 from .abstract_llm import AbstractLLM
+from .async_openai_handler import AsyncOpenAIHandler
+from .embedding_cache import EmbeddingCache
+from .embedding_engine import EmbeddingEngine
 from .hf_handler import HFHandler
 from .openai_handler import OpenAIHandler
+from .rerank_cascade import RerankCascade
+from .rerank_engine import RerankEngine
 
-__all__ = ["AbstractLLM", "HFHandler", "OpenAIHandler"]
+__all__ = [
+    "AbstractLLM",
+    "AsyncOpenAIHandler",
+    "EmbeddingCache",
+    "EmbeddingEngine",
+    "HFHandler",
+    "OpenAIHandler",
+    "RerankCascade",
+    "RerankEngine",
+]
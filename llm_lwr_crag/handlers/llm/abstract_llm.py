@@ -1,10 +1,22 @@
+import hashlib
+import json
 from abc import ABC
-from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple, Type, Union, cast
 
+import progressbar
 from box import Box
-from langchain.schema import Document, HumanMessage
+from langchain.schema import Document, HumanMessage, SystemMessage
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable
+from utils.checkpoint import Checkpoint
+from utils.concurrency import RateLimiter, call_with_retry
+from utils.logging import logger
+from utils.lru_cache import LRUCache
+from utils.path import path
+
+from .embedding_cache import EmbeddingCache
 
 
 class AbstractLLM(ABC):
@@ -12,6 +24,23 @@ class AbstractLLM(ABC):
     model: Union[BaseLanguageModel, Embeddings]
     summarize_msg: Optional[str] = ""
     augment_msg: Optional[str] = ""
+    split_text_system_msg: Optional[str] = ""
+    split_text_human_msg: Optional[str] = ""
+
+    # Concurrency of batched requests, overriden by API-based handlers
+    num_threads: int = 1
+    max_retries: int = 0
+    rate_limiter: Optional[RateLimiter] = None
+    transient_errors: Tuple[Type[BaseException], ...] = ()
+    checkpoint: Optional[Checkpoint] = None
+    # Model used for chunking (allowing longer responses than `model`), set up
+    # by generative handlers
+    split_text_model: Optional[Runnable] = None
+
+    # Persistent cache of document embeddings, set up by embedding handlers
+    embedding_cache: Optional[EmbeddingCache] = None
+    # In-memory cache of query embeddings, set up by embedding handlers
+    query_cache: Optional[LRUCache] = None
 
     def __init__(self, args: Box):
         pass
@@ -22,7 +51,21 @@ class AbstractLLM(ABC):
         """
         if self.use_case != "embedding":
             raise ValueError("Cannot embed the query using non-embedding model.")
-        return self.model.embed_query(query)
+
+        model = cast(Embeddings, self.model)
+        if self.query_cache is None:
+            return model.embed_query(query)
+
+        # Queries differing only in whitespace share the embedding
+        query = " ".join(query.split())
+        key = (str(self), query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            embedding = model.embed_query(query)
+            self.query_cache.set(key, embedding)
+
+        # Copy, so the caller cannot modify the cached embedding
+        return list(embedding)
 
     def embed_documents(self, docs: List[str]) -> List[List[float]]:
         """
@@ -30,15 +73,30 @@ class AbstractLLM(ABC):
         """
         if self.use_case != "embedding":
             raise ValueError("Cannot embed documents using non-embedding model.")
-        return self.model.embed_documents(docs)
 
-    def gen_summary(self, doc_or_text: Union[Document, str]) -> str:
+        model = cast(Embeddings, self.model)
+        if self.embedding_cache is None:
+            return model.embed_documents(docs)
+
+        # Embed only the texts not embedded before (by any run, or database)
+        embeddings = self.embedding_cache.get(docs)
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        new_embeddings: List[List[float]] = []
+        if missing:
+            new_embeddings = model.embed_documents([docs[idx] for idx in missing])
+            self.embedding_cache.add([docs[idx] for idx in missing], new_embeddings)
+
+        # Fill in the new embeddings, in the order of the missing texts
+        new_embeddings_iter = iter(new_embeddings)
+        return [
+            embedding if embedding is not None else next(new_embeddings_iter)
+            for embedding in embeddings
+        ]
+
+    def summary_prompt(self, doc_or_text: Union[Document, str]) -> list:
         """
-        Generate LLM summary for the given content.
+        Create the prompt for summarizing the given content.
         """
-        if self.use_case != "generation":
-            raise ValueError("Cannot generate summary using non-generative model.")
-
         # If Document is provided
         text = doc_or_text
         if isinstance(text, Document):
@@ -68,27 +126,229 @@ class AbstractLLM(ABC):
                 ),
             ]
 
-        response = self.model.invoke(prompt)
-        return response.content.strip()
+        return prompt
+
+    def gen_summary(self, doc_or_text: Union[Document, str]) -> str:
+        """
+        Generate LLM summary for the given content.
+        """
+        if self.use_case != "generation":
+            raise ValueError("Cannot generate summary using non-generative model.")
+
+        return self.invoke(self.summary_prompt(doc_or_text))
+
+    def gen_summaries(self, docs_or_texts: List[Union[Document, str]]) -> List[str]:
+        """
+        Generate LLM summaries for the given contents, in a single batch.
+        """
+        if self.use_case != "generation":
+            raise ValueError("Cannot generate summary using non-generative model.")
+
+        responses = cast(BaseLanguageModel, self.model).batch(
+            [self.summary_prompt(doc_or_text) for doc_or_text in docs_or_texts]
+        )
+        return [AbstractLLM.response_text(response) for response in responses]
+
+    def augment_prompt(self, query: str) -> list:
+        """
+        Create the prompt for augmenting the given query.
+        """
+        return [
+            HumanMessage(
+                content=f"""
+                    {self.augment_msg}
+
+                    Text:
+                    {query}
+                    """
+            ),
+        ]
 
     def augment(self, query: str) -> str:
         if self.use_case != "generation":
             raise ValueError("Cannot augment query using non-generative model.")
 
-        # If Document is provided
+        return self.invoke(self.augment_prompt(query))
+
+    def invoke(self, prompt) -> str:
+        """
+        Invoke the model, respecting the rate limit and retrying transient
+        failures.
+        """
+        response = call_with_retry(
+            lambda: self.model.invoke(prompt),
+            retry_on=self.transient_errors,
+            max_retries=self.max_retries,
+            rate_limiter=self.rate_limiter,
+        )
+        return AbstractLLM.response_text(response)
+
+    @staticmethod
+    def response_text(response) -> str:
+        """
+        Get the text of the model's response. Chat models return a message,
+        while plain LLMs (e.g. Huggingface pipelines) return the text itself.
+        """
+        return getattr(response, "content", response).strip()
+
+    @staticmethod
+    def finish_reason(response) -> Optional[str]:
+        """
+        Get the reason the model stopped generating the response (e.g. "length",
+        once the token limit is reached), if reported by the model.
+        """
+        return getattr(response, "response_metadata", {}).get("finish_reason", None)
+
+    @staticmethod
+    def parse_chunks(response: str) -> List[str]:
+        """
+        Parse the chunks from the JSON response of the chunking LLM, such as:
+        `{"chunks": [{"title": "...", "content": "..."}, ...]}`.
+        Raises ValueError if the response is not of the expected format.
+        """
+        # Model may wrap the JSON into a Markdown code block, or add a comment
+        start, end = response.find("{"), response.rfind("}") + 1
+        if start == -1 or end == 0:
+            raise ValueError("No JSON object found in the response.")
+
+        try:
+            chunks = json.loads(response[start:end])["chunks"]
+            return [chunk["content"] for chunk in chunks if chunk.get("content")]
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid chunking response: {e}") from e
+
+    def try_split_text(self, text: str) -> Optional[List[str]]:
+        """
+        Split the text into chunks, using the LLM.
+        Returns None if the response is cut off (by the token limit), or cannot
+        be parsed.
+        """
+        if self.use_case != "generation" or self.split_text_model is None:
+            raise ValueError("Cannot split text using non-generative model.")
+
         prompt = [
+            SystemMessage(content=self.split_text_system_msg or ""),
             HumanMessage(
                 content=f"""
-                    {self.augment_msg}
+                    {self.split_text_human_msg}
 
                     Text:
-                    {query}
+                    {text}
                     """
             ),
         ]
 
-        response = self.model.invoke(prompt)
-        return response.content.strip()
+        model = self.split_text_model
+        response = call_with_retry(
+            lambda: model.invoke(prompt),
+            retry_on=self.transient_errors,
+            max_retries=self.max_retries,
+            rate_limiter=self.rate_limiter,
+        )
+        if AbstractLLM.finish_reason(response) == "length":
+            logger.warning("Chunking response was cut off by the token limit.")
+            return None
+
+        try:
+            chunks = AbstractLLM.parse_chunks(AbstractLLM.response_text(response))
+        except ValueError as e:
+            logger.warning(str(e))
+            return None
+
+        if not chunks:
+            logger.warning("Chunking response contains no chunks.")
+            return None
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split the text into chunks, using the LLM.
+        If the response is cut off, or cannot be parsed, the whole text is kept
+        as a single chunk.
+        """
+        return self.try_split_text(text) or [text]
+
+    def split_text_key(self, text: str) -> str:
+        """
+        Key of the text within the chunking checkpoint. Depends on the model and
+        prompts as well, so the results of a different setup are not reused.
+        """
+        hasher = hashlib.sha256()
+        for part in (
+            str(self),
+            self.split_text_system_msg,
+            self.split_text_human_msg,
+            text,
+        ):
+            hasher.update((part or "").encode("utf-8", errors="ignore"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def split_text_in_batches(
+        self, texts: List[str], checkpoint_path: Optional[str] = None
+    ) -> List[List[str]]:
+        """
+        Split the texts into chunks, sending up to `num_threads` requests at
+        once.
+        If `checkpoint_path` is provided, chunks of every finished text are
+        saved to it immediately, and texts finished by a previous (interrupted)
+        run are not sent again.
+
+        Args:
+            texts (List[str]): Texts to split.
+            checkpoint_path (Optional[str]): Path to the checkpoint file.
+
+        Returns:
+            List[List[str]]: Chunks of each of the texts, in the original order.
+        """
+        checkpoint = None
+        if checkpoint_path:
+            # Keep the checkpoint loaded, as texts may come in multiple batches
+            checkpoint_path = str(path(checkpoint_path))
+            if (
+                self.checkpoint is None
+                or self.checkpoint.checkpoint_path != checkpoint_path
+            ):
+                self.checkpoint = Checkpoint(checkpoint_path)
+            checkpoint = self.checkpoint
+
+        keys = [self.split_text_key(text) for text in texts]
+        splits: List[Optional[List[str]]] = [
+            checkpoint.get(key) if checkpoint else None for key in keys
+        ]
+        todo = [idx for idx, split in enumerate(splits) if split is None]
+        if len(todo) < len(texts):
+            logger.info(f"Reusing {len(texts) - len(todo)} checkpointed texts.")
+
+        with progressbar.ProgressBar(
+            widgets=[
+                "LLM chunking: ",
+                "[",
+                progressbar.Percentage(),
+                "] ",
+                progressbar.Bar(),
+                " ",
+                progressbar.ETA(),
+            ],
+            max_value=len(todo),
+        ) as bar, ThreadPoolExecutor(max_workers=max(self.num_threads, 1)) as executor:
+            future_to_idx = {
+                executor.submit(self.try_split_text, texts[idx]): idx for idx in todo
+            }
+            for num_done, future in enumerate(as_completed(future_to_idx), start=1):
+                idx = future_to_idx[future]
+                chunks = future.result()
+                if chunks is None:
+                    # Failed texts are kept whole, but not checkpointed, so the
+                    # next run splits them again
+                    splits[idx] = [texts[idx]]
+                else:
+                    splits[idx] = chunks
+                    if checkpoint is not None:
+                        checkpoint.add(keys[idx], chunks)
+                bar.update(num_done)
+
+        return splits  # type: ignore
 
     def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
         """
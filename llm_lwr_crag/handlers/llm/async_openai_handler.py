@@ -0,0 +1,100 @@
+import asyncio
+from typing import List, Union
+
+import httpx
+from langchain.schema import Document
+
+from .openai_handler import OpenAIHandler
+
+
+class AsyncOpenAIHandler(OpenAIHandler):
+    """
+    Asynchronous variant of the OpenAI handler.
+
+    All the requests are sent from a single event loop (running in a
+    background thread), over a shared pool of keep-alive HTTP connections.
+    At most `num_threads` requests are in flight at once, no matter how many
+    threads use the handler, and transient failures (429s, 5xx errors,
+    timeouts) are retried with exponential backoff.
+
+    Every method has an asynchronous counterpart (`agen_summary`, `aaugment`,
+    `arerank`, `agenerate`), while the blocking ones wrap them, so existing
+    callers work unchanged.
+    """
+
+    def __init__(self, args):
+        num_connections = max(args.num_threads, 1)
+        limits = httpx.Limits(
+            max_connections=num_connections,
+            max_keepalive_connections=num_connections,
+        )
+        self.http_client = httpx.Client(limits=limits)
+        self.http_async_client = httpx.AsyncClient(limits=limits)
+        self.semaphore = asyncio.Semaphore(num_connections)
+
+        super().__init__(args)
+
+    def __str__(self):
+        return f"AsyncOpenAI({self.model_name})"
+
+    def client_kwargs(self) -> dict:
+        return {
+            **super().client_kwargs(),
+            "http_client": self.http_client,
+            "http_async_client": self.http_async_client,
+        }
+
+    def close(self) -> None:
+        """
+        Close the connection pool and stop the event loop.
+        """
+        self.run(self.http_async_client.aclose())
+        self.http_client.close()
+        loop = self.event_loop()
+        loop.call_soon_threadsafe(loop.stop)
+        if self.loop_thread is not None:
+            self.loop_thread.join()
+
+    async def ainvoke_all(self, prompts: List[list]) -> List[str]:
+        return await asyncio.gather(
+            *(self.ainvoke(prompt, self.semaphore) for prompt in prompts)
+        )
+
+    def invoke(self, prompt) -> str:
+        return self.run(self.ainvoke(prompt, self.semaphore))
+
+    async def agen_summary(self, doc_or_text: Union[Document, str]) -> str:
+        if self.use_case != "generation":
+            raise ValueError("Cannot generate summary using non-generative model.")
+
+        return await self.ainvoke(self.summary_prompt(doc_or_text), self.semaphore)
+
+    async def aaugment(self, query: str) -> str:
+        if self.use_case != "generation":
+            raise ValueError("Cannot augment query using non-generative model.")
+
+        return await self.ainvoke(self.augment_prompt(query), self.semaphore)
+
+    async def arerank(self, query: str, chunks: List[Document]) -> List[Document]:
+        if self.rerank_mode == "pointwise":
+            responses = await self.ainvoke_all(
+                [self.rerank_prompt(query, chunk) for chunk in chunks]
+            )
+            return OpenAIHandler.sort_by_scores(chunks, responses)
+
+        # Windows depend on the ranking of the previous ones
+        chunks = list(chunks)
+        for start, end in self.rerank_windows(len(chunks)):
+            window = chunks[start:end]
+            response = await self.ainvoke(
+                self.listwise_rerank_prompt(query, window), self.semaphore
+            )
+            permutation = OpenAIHandler.parse_permutation(response, len(window))
+            chunks[start:end] = [window[idx] for idx in permutation]
+        return chunks
+
+    def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
+        return self.run(self.arerank(query, chunks))
+
+    async def agenerate(self, query: str, chunks: List[Document]) -> str:
+        return await self.ainvoke(self.generate_prompt(query, chunks), self.semaphore)
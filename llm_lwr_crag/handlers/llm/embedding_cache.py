@@ -0,0 +1,184 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from utils.logging import logger
+from utils.path import path
+
+__all__ = ["EmbeddingCache"]
+
+# Content hashes are stored as SHA-256 hex digests, one per line
+HASH_SIZE = 64
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of embeddings: content hash -> vector.
+
+    Vectors are appended to a flat float32 file, read through a memory map,
+    while the content hashes are appended (one per line, in the same order) to
+    an index file. The whole cache is never loaded into memory - only the index
+    is, and rows are read on lookup.
+    Each embedding model gets a cache of its own, so vectors of different
+    models are never mixed.
+
+    Multiple processes may share the cache: files are only modified under an
+    exclusive file lock, and every process catches up with the rows appended
+    by the others before appending its own.
+    """
+
+    def __init__(self, cache_dir: str, model: str):
+        model_hash = hashlib.sha256(model.encode("utf-8")).hexdigest()[:16]
+        self.cache_dir = os.path.join(str(path(cache_dir)), model_hash)
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.index_path = os.path.join(self.cache_dir, "index.txt")
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+        self.lock_path = os.path.join(self.cache_dir, "lock")
+
+        self.model = model
+        self.dim = 0  # Unknown, until the first vector is stored
+        self.rows: Dict[str, int] = {}
+        self.vectors: Optional[np.memmap] = None
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.file_lock():
+            self.sync()
+        if self.rows:
+            logger.info(f"Loaded {len(self.rows)} cached embeddings of {model}")
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+    @contextmanager
+    def file_lock(self) -> Iterator[None]:
+        """
+        Lock the cache against other threads, and other processes.
+        """
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def sync(self) -> None:
+        """
+        Load the rows appended (by any process) since the last sync.
+        Must be called with the file lock held.
+
+        Vectors are written before their hashes, so an interrupted write can
+        leave vectors without a hash (or a partial hash) - they are dropped, so
+        the rows of both files stay aligned.
+        """
+        if not self.dim:
+            if not os.path.exists(self.meta_path):
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model}, f)
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f).get("dim", 0)
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return
+
+        # Only the rows not loaded yet
+        offset = len(self.rows) * (HASH_SIZE + 1)
+        index = ""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8", errors="ignore") as f:
+                f.seek(offset)
+                index = f.read()
+
+        # Only complete lines - the last one may have been cut short
+        hashes = index.split("\n")[:-1]
+        num_vectors = os.path.getsize(self.vectors_path) // (4 * self.dim)
+        hashes = hashes[: num_vectors - len(self.rows)]
+        valid_index = "".join(f"{text_hash}\n" for text_hash in hashes)
+
+        num_rows = len(self.rows) + len(hashes)
+        if num_vectors != num_rows or index != valid_index:
+            os.truncate(self.vectors_path, num_rows * 4 * self.dim)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.truncate(offset + len(valid_index))
+
+        for text_hash in hashes:
+            self.rows[text_hash] = len(self.rows)
+
+    def mapped_vectors(self) -> np.memmap:
+        """
+        Get the memory map of the stored vectors, remapping it if new vectors
+        have been appended since.
+        """
+        num_rows = len(self.rows)
+        vectors = self.vectors
+        if vectors is None or len(vectors) < num_rows:
+            vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(num_rows, self.dim),
+            )
+            self.vectors = vectors
+        return vectors
+
+    def get(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up the embeddings of the texts.
+
+        Returns:
+            List[Optional[List[float]]]: Embedding of each text, or None if it
+                is not cached.
+        """
+        hashes = [EmbeddingCache.hash_text(text) for text in texts]
+        with self.file_lock():
+            # Texts may have been embedded by another process in the meantime
+            if any(text_hash not in self.rows for text_hash in hashes):
+                self.sync()
+
+            rows = [self.rows.get(text_hash) for text_hash in hashes]
+            if all(row is None for row in rows):
+                return [None] * len(texts)
+
+            vectors = self.mapped_vectors()
+            return [None if row is None else vectors[row].tolist() for row in rows]
+
+    def add(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Append the embeddings of the texts to the cache.
+        """
+        if not texts:
+            return
+
+        array = np.asarray(embeddings, dtype=np.float32)
+        with self.file_lock():
+            self.sync()
+            if not self.dim:
+                self.dim = array.shape[1]
+                with open(self.meta_path, "r+", encoding="utf-8") as f:
+                    meta = json.load(f)
+                    meta["dim"] = self.dim
+                    f.seek(0)
+                    json.dump(meta, f)
+                    f.truncate()
+
+            # Used as an ordered set
+            new_rows: Dict[str, np.ndarray] = {}
+            for text, vector in zip(texts, array):
+                text_hash = EmbeddingCache.hash_text(text)
+                if text_hash not in self.rows:
+                    new_rows.setdefault(text_hash, vector)
+            if not new_rows:
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(new_rows.values())).tobytes())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{text_hash}\n" for text_hash in new_rows))
+
+            for text_hash in new_rows:
+                self.rows[text_hash] = len(self.rows)
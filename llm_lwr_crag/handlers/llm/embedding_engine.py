@@ -0,0 +1,146 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import torch
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+__all__ = ["EmbeddingEngine", "worker_threads"]
+
+# Engine of the worker process, inherited from the parent
+worker_engine: Optional["EmbeddingEngine"] = None
+
+
+def worker_threads(num_workers: int) -> int:
+    """
+    Get the number of threads of a worker - the cores are split among the
+    workers, instead of being oversubscribed.
+    """
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+
+def init_worker(engine: "EmbeddingEngine", num_threads: int) -> None:
+    global worker_engine
+    worker_engine = engine
+    # Limits PyTorch only - ONNX Runtime threads are set by its session options
+    torch.set_num_threads(num_threads)
+
+
+def encode_in_worker(texts: List[str]) -> np.ndarray:
+    if worker_engine is None:
+        raise RuntimeError("Embedding worker has not been initialized.")
+    return worker_engine.encode(texts)
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Embedding engine, batching the texts by their (token) lengths.
+
+    Texts are sorted by their token lengths, and grouped into batches whose
+    padded size (number of texts x length of the longest one) stays within
+    `max_batch_tokens`. Texts of similar lengths end up together, so little
+    compute is wasted on padding, while short texts are embedded in large
+    batches. Embeddings are returned in the original order of the texts.
+
+    With `num_workers` set, batches are embedded by a pool of worker processes
+    (CPU only). Workers are forked from the process that loaded the model, so
+    they share a single (read-only, copy-on-write) copy of its weights, and
+    take the batches from the pool's queue. ONNX models should be loaded with
+    `worker_threads(num_workers)` intra-op threads (see `load_onnx_model`).
+    """
+
+    def __init__(
+        self,
+        model: SentenceTransformer,
+        max_batch_tokens: int = 16384,
+        num_workers: Optional[int] = None,
+    ):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+
+        self.pool: Optional[ProcessPoolExecutor] = None
+        if num_workers and num_workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=mp.get_context("fork"),
+                initializer=init_worker,
+                initargs=(self, worker_threads(num_workers)),
+            )
+            # Fork the workers right away - before the engine runs the model,
+            # so no PyTorch (e.g. OpenMP) thread pools are inherited by them.
+            # ONNX models have already been run (by the parity check), while
+            # their thread pools are sized by the session options
+            self.pool.submit(int).result()
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """
+        Get the lengths of the texts, in tokens (truncated to the maximum
+        length of the model).
+        """
+        input_ids = self.model.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+        )["input_ids"]
+        return [len(ids) for ids in input_ids]
+
+    def make_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Group the texts (their indices) into batches within the token budget.
+
+        Args:
+            lengths (List[int]): Token lengths of the texts.
+
+        Returns:
+            List[List[int]]: Batches of indices of the texts.
+        """
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        # Longest first - the first text of a batch sets its padded length
+        for idx in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+            if batch and (len(batch) + 1) * lengths[batch[0]] > self.max_batch_tokens:
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a single batch of texts.
+        """
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        # Newlines are replaced, as by `HuggingFaceEmbeddings`
+        texts = [text.replace("\n", " ") for text in texts]
+        batches = self.make_batches(self.token_lengths(texts))
+        batch_texts = [[texts[idx] for idx in batch] for batch in batches]
+        if self.pool is not None and len(batches) > 1:
+            # Results are yielded in the order of the batches
+            all_embeddings = self.pool.map(encode_in_worker, batch_texts)
+        else:
+            all_embeddings = map(self.encode, batch_texts)
+
+        embeddings: List[List[float]] = [[] for _ in texts]
+        for batch, batch_embeddings in zip(batches, all_embeddings):
+            for idx, embedding in zip(batch, batch_embeddings):
+                embeddings[idx] = embedding.tolist()
+
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text.replace("\n", " ")])[0].tolist()
@@ -2,10 +2,8 @@ from typing import List
 
 import torch
 from langchain.schema import Document
-from langchain_huggingface import (
-    HuggingFaceEmbeddings,
-    HuggingFacePipeline,
-)
+from langchain_huggingface import HuggingFacePipeline
+from sentence_transformers import SentenceTransformer
 from transformers import (
     AutoConfig,
     AutoModelForSeq2SeqLM,
@@ -13,23 +11,55 @@ from transformers import (
     AutoTokenizer,
     pipeline,
 )
+from utils.lru_cache import LRUCache
 from utils.parse import parse_txt
 from utils.path import path
 
 from .abstract_llm import AbstractLLM
+from .embedding_cache import EmbeddingCache
+from .embedding_engine import EmbeddingEngine, worker_threads
+from .onnx_backend import load_onnx_model
+from .rerank_engine import RerankEngine, quantize_reranker
 
 
 class HFHandler(AbstractLLM):
     def __init__(self, args):
         self.model_name = args.model_name
         self.device = "cuda" if args.device and torch.cuda.is_available() else "cpu"
+        self.backend = "torch"
 
         self.use_case = args.use_case
         if self.use_case == "embedding":
-            self.model = HuggingFaceEmbeddings(
-                model_name=self.model_name,
-                model_kwargs={"device": self.device},
+            # Worker processes cannot share a CUDA context
+            num_workers = args.num_workers if self.device == "cpu" else None
+
+            model = None
+            if args.backend == "onnx":
+                # None if the exported model fails the parity check - PyTorch
+                # model is used instead
+                model = load_onnx_model(
+                    self.model_name,
+                    args.onnx_dir,
+                    quantization=args.quantization,
+                    min_similarity=args.parity_min_similarity,
+                    num_threads=worker_threads(num_workers) if num_workers else None,
+                )
+            if model is None:
+                model = SentenceTransformer(self.model_name, device=self.device)
+            else:
+                self.backend = f"onnx-{args.quantization or 'fp32'}"
+
+            self.model = EmbeddingEngine(
+                model,
+                max_batch_tokens=args.max_batch_tokens,
+                num_workers=num_workers,
             )
+            if args.embedding_cache_dir:
+                self.embedding_cache = EmbeddingCache(
+                    args.embedding_cache_dir, str(self)
+                )
+            if args.query_cache_size:
+                self.query_cache = LRUCache(args.query_cache_size, args.query_cache_ttl)
         elif self.use_case == "generation":
             model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
@@ -43,7 +73,20 @@ class HFHandler(AbstractLLM):
                 do_sample=False,
                 repetition_penalty=1.03,
             )
-            self.model = HuggingFacePipeline(pipeline=pipe)
+            # Batched calls (e.g. summaries) are run through the pipeline in
+            # batches of `batch_size` prompts
+            self.model = HuggingFacePipeline(pipeline=pipe, batch_size=args.batch_size)
+            # Chunks of a whole file do not fit into a short response - same
+            # model, with a larger generation limit
+            split_text_pipe = pipeline(
+                task="text2text-generation",
+                model=model,
+                tokenizer=self.tokenizer,
+                max_new_tokens=args.split_text_max_tokens,
+                do_sample=False,
+                repetition_penalty=1.03,
+            )
+            self.split_text_model = HuggingFacePipeline(pipeline=split_text_pipe)
 
             # Load standard prompt templates
             self.split_text_system_msg = parse_txt(path(args.split_text_system_msg))
@@ -63,38 +106,39 @@ class HFHandler(AbstractLLM):
                 )
 
             self.model = AutoModelForSequenceClassification.from_pretrained(
-                "cross-encoder/ms-marco-MiniLM-L6-v2"
-            )
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                "cross-encoder/ms-marco-MiniLM-L6-v2"
+                self.model_name
+            ).to(self.device)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.reranker = RerankEngine(
+                self.model,
+                self.tokenizer,
+                batch_size=args.rerank_batch_size,
+                max_length=args.rerank_max_length,
+                cache=(
+                    LRUCache(args.rerank_cache_size) if args.rerank_cache_size else None
+                ),
             )
+
+            # Dynamically quantized kernels run on CPU only
+            if args.quantization and self.device == "cpu":
+                reranker = quantize_reranker(
+                    self.reranker,
+                    args.quantization,
+                    min_similarity=args.parity_min_similarity,
+                )
+                if reranker is not None:
+                    self.reranker = reranker
+                    self.model = reranker.model
+                    self.backend = f"qint8-{args.quantization}"
         else:
             raise ValueError(f"Invalid Huggingface model use case: {self.use_case}")
 
     def __str__(self):
+        # Embeddings of other backends differ (slightly), so they are cached
+        # separately (and experiments are logged separately)
+        if self.backend != "torch":
+            return f"Huggingface({self.model_name}, {self.backend})"
         return f"Huggingface({self.model_name})"
 
     def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
-        query_chunk_pairs = [
-            [query for _ in range(len(chunks))],
-            [ch.page_content for ch in chunks],
-        ]
-        feats = self.tokenizer(
-            query_chunk_pairs[0],
-            query_chunk_pairs[1],
-            padding=True,
-            truncation=True,
-            return_tensors="pt",
-        )
-
-        self.model.eval()
-        with torch.no_grad():
-            scores = self.model(**feats).logits
-
-        chunk_score_pairs = list(zip(chunks, scores))
-        sorted_chunk_score_pairs = sorted(
-            chunk_score_pairs, key=lambda x: x[1], reverse=True
-        )
-
-        sorted_chunks = [pair[0] for pair in sorted_chunk_score_pairs]
-        return sorted_chunks
+        return self.reranker.rerank(query, chunks)
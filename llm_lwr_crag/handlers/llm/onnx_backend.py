@@ -0,0 +1,147 @@
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+from onnxruntime import SessionOptions
+from sentence_transformers import (
+    SentenceTransformer,
+    export_dynamic_quantized_onnx_model,
+)
+from utils.logging import logger
+from utils.path import path
+
+__all__ = ["load_onnx_model", "check_parity"]
+
+# Texts the exported model is compared against the PyTorch one on - a mix of
+# code and natural language, similar to what is embedded during retrieval
+PARITY_TEXTS = [
+    "def add(a, b):\n    return a + b",
+    "class Retriever:\n    def __call__(self, query: str, k: int = 5): ...",
+    "import os\nfrom typing import List, Optional",
+    "for (int i = 0; i < n; i++) { sum += values[i]; }",
+    "How is the configuration file validated?",
+    "Where are the documents split into chunks?",
+    "README: install the dependencies and run the evaluation script.",
+    "SELECT name, COUNT(*) FROM users GROUP BY name;",
+]
+
+
+def onnx_file_name(export_dir: str, quantization: Optional[str]) -> Optional[str]:
+    """
+    Find the ONNX model file (of given quantization) within the exported model.
+
+    Returns:
+        Optional[str]: Path of the file, relative to the exported model, or
+            None if it has not been exported yet.
+    """
+    name = "model.onnx" if quantization is None else f"model_qint8_{quantization}.onnx"
+    # Models are saved in the "onnx" subfolder, or at the top level
+    for file_name in [f"onnx/{name}", name]:
+        if os.path.exists(os.path.join(export_dir, file_name)):
+            return file_name
+    return None
+
+
+def check_parity(
+    reference: SentenceTransformer,
+    model: SentenceTransformer,
+    texts: List[str] = PARITY_TEXTS,
+) -> float:
+    """
+    Compare the embeddings of the model against the reference ones.
+
+    Returns:
+        float: Minimum cosine similarity of the embeddings of a text.
+    """
+    expected = reference.encode(texts, convert_to_numpy=True)
+    actual = model.encode(texts, convert_to_numpy=True)
+    similarities = np.sum(expected * actual, axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return float(similarities.min())
+
+
+def load_onnx_model(
+    model_name: str,
+    onnx_dir: str,
+    quantization: Optional[str] = None,
+    min_similarity: float = 0.99,
+    num_threads: Optional[int] = None,
+) -> Optional[SentenceTransformer]:
+    """
+    Load the ONNX (Runtime) version of the embedding model, for fast CPU
+    inference.
+
+    On the first use, the model is exported to ONNX (and, optionally,
+    dynamically quantized to int8) into `onnx_dir`, and its embeddings are
+    checked against the ones of the original, PyTorch model. Both the export
+    and the result of the parity check are cached, so later runs load the
+    exported model directly.
+
+    Args:
+        model_name (str): Name of the (sentence-transformers) model.
+        onnx_dir (str): Directory to store the exported models in.
+        quantization (Optional[str]): Dynamic int8 quantization config
+            ("arm64", "avx2", "avx512", "avx512_vnni"), or None for full
+            precision.
+        min_similarity (float): Minimum cosine similarity between the
+            embeddings of the exported and the original model.
+        num_threads (Optional[int]): Number of intra-op threads of the ONNX
+            Runtime session, or None for its default (all the cores).
+
+    Returns:
+        Optional[SentenceTransformer]: The exported model, or None if it fails
+            the parity check.
+    """
+    export_dir = os.path.join(str(path(onnx_dir)), model_name.replace("/", "--"))
+    if onnx_file_name(export_dir, None) is None:
+        logger.info(f"Exporting {model_name} to ONNX, into {export_dir}...")
+        SentenceTransformer(model_name, backend="onnx", device="cpu").save_pretrained(
+            export_dir
+        )
+
+    if onnx_file_name(export_dir, quantization) is None:
+        logger.info(f"Quantizing {model_name} ({quantization})...")
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(export_dir, backend="onnx", device="cpu"),
+            quantization,
+            export_dir,
+        )
+
+    file_name = onnx_file_name(export_dir, quantization)
+    session_options = SessionOptions()
+    if num_threads is not None:
+        session_options.intra_op_num_threads = num_threads
+    model = SentenceTransformer(
+        export_dir,
+        backend="onnx",
+        device="cpu",
+        model_kwargs={"file_name": file_name, "session_options": session_options},
+    )
+
+    # Parity is checked once per exported file
+    parity_path = os.path.join(export_dir, "parity.json")
+    parity = {}
+    if os.path.exists(parity_path):
+        with open(parity_path, "r", encoding="utf-8") as f:
+            parity = json.load(f)
+
+    if file_name not in parity:
+        reference = SentenceTransformer(model_name, device="cpu")
+        parity[file_name] = check_parity(reference, model)
+        with open(parity_path, "w", encoding="utf-8") as f:
+            json.dump(parity, f, indent=4)
+
+    if parity[file_name] < min_similarity:
+        logger.warning(
+            f"ONNX model {file_name} of {model_name} failed the parity check "
+            f"(cosine similarity {parity[file_name]:.4f} < {min_similarity})."
+        )
+        return None
+
+    logger.info(
+        f"Loaded ONNX model {file_name} of {model_name} "
+        f"(cosine similarity {parity[file_name]:.4f})."
+    )
+    return model
@@ -1,26 +1,59 @@
+import asyncio
 import os
-from typing import List
+import re
+import threading
+from typing import Any, Coroutine, List, Optional, Tuple, TypeVar, Union, cast
 
+import openai
 from langchain.schema import Document, HumanMessage
+from langchain_core.language_models import BaseLanguageModel
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from utils.concurrency import RateLimiter, acall_with_retry
+from utils.lru_cache import LRUCache
 from utils.parse import parse_txt
 from utils.path import path
 
 from .abstract_llm import AbstractLLM
+from .embedding_cache import EmbeddingCache
+
+T = TypeVar("T")
+
+# Maximum number of tokens of a response, and of a single entry of a listwise
+# ranking (e.g. "[12] > ")
+MAX_TOKENS = 200
+LISTWISE_TOKENS_PER_CHUNK = 6
 
 
 class OpenAIHandler(AbstractLLM):
+    # Failures worth retrying - rate limits, timeouts and server-side errors
+    transient_errors = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
     def __init__(self, args):
+        # Event loop running the asynchronous requests, started on demand
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        self.loop_lock = threading.Lock()
+
         self.batch_size = args.batch_size
         self.num_threads = args.num_threads
         self.model_name = args.model_name
 
+        # Requests are retried and rate-limited by the handler itself
+        self.max_retries = args.max_retries
+        self.rate_limiter = RateLimiter(args.requests_per_minute)
+
         # Load standard prompt templates
         self.split_text_system_msg = parse_txt(path(args.split_text_system_msg))
         self.split_text_human_msg = parse_txt(path(args.split_text_human_msg))
         self.summarize_msg = parse_txt(path(args.summarize_msg))
         self.augment_msg = parse_txt(path(args.augment_msg))
         self.rerank_msg = parse_txt(path(args.rerank_msg))
+        self.rerank_listwise_msg = parse_txt(path(args.rerank_listwise_msg))
         self.generate_msg = parse_txt(path(args.generate_msg))
 
         # Set up api key
@@ -34,18 +67,45 @@ class OpenAIHandler(AbstractLLM):
                     "OPENAI_API_KEY not provided in .env, nor in config files"
                 )
 
+        self.rerank_mode = args.rerank_mode
+        self.rerank_window_size = args.rerank_window_size
+        self.rerank_window_step = args.rerank_window_step
+
+        # Custom endpoint, e.g. an OpenAI-compatible server (or a local stand-in)
+        self.base_url = args.base_url
+
         self.use_case = args.use_case
         if self.use_case == "embedding":
             self.model = OpenAIEmbeddings(
                 openai_api_key=self.api_key,
                 model=self.model_name,
+                **self.client_kwargs(),
             )
+            if args.embedding_cache_dir:
+                self.embedding_cache = EmbeddingCache(
+                    args.embedding_cache_dir, str(self)
+                )
+            if args.query_cache_size:
+                self.query_cache = LRUCache(args.query_cache_size, args.query_cache_ttl)
         elif self.use_case == "generation" or self.use_case == "reranking":
+            max_tokens = MAX_TOKENS
+            if self.use_case == "reranking" and self.rerank_mode == "listwise":
+                # The ranking of a whole window must fit into the response
+                max_tokens = max(
+                    max_tokens, LISTWISE_TOKENS_PER_CHUNK * self.rerank_window_size
+                )
+
             self.model = ChatOpenAI(
                 openai_api_key=self.api_key,
                 model=self.model_name,
                 temperature=0,
-                max_tokens=200,
+                max_tokens=max_tokens,
+                max_retries=0,
+                **self.client_kwargs(),
+            )
+            # Chunks of a whole file do not fit into a short response
+            self.split_text_model = self.model.bind(
+                max_tokens=args.split_text_max_tokens
             )
         else:
             raise ValueError(f"Invalid OpenAI model use case: {self.use_case}")
@@ -53,26 +113,93 @@ class OpenAIHandler(AbstractLLM):
     def __str__(self):
         return f"OpenAI({self.model_name})"
 
-    def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
-        scored_chunks = []
-        for chunk in chunks:
-            prompt = [
-                HumanMessage(
-                    content=f"""
-                        {self.rerank_msg}
-
-                        Query:
-                        {query}
-
-                        Chunk:
-                        {chunk}
-                        """
-                ),
-            ]
+    def client_kwargs(self) -> dict:
+        """
+        Arguments of the OpenAI client, shared by the models.
+        """
+        return {"base_url": self.base_url}
 
-            response = self.model.invoke(prompt)
+    def event_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Get the event loop of the handler, running in a background thread.
+        The loop is started on the first use, and kept for the lifetime of the
+        handler, so the clients (and their connection pools) are always used
+        from the same loop.
+        """
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop_thread = threading.Thread(
+                    target=self.loop.run_forever, daemon=True
+                )
+                self.loop_thread.start()
+        return self.loop
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Run the coroutine on the handler's event loop, blocking until its
+        result. Safe to call from multiple threads.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.event_loop()).result()
+
+    async def ainvoke(self, prompt, semaphore: asyncio.Semaphore) -> str:
+        """
+        Invoke the model asynchronously, respecting the rate limit and
+        retrying transient failures. At most `num_threads` requests are in
+        flight at once, as limited by the shared `semaphore`.
+        """
+        async with semaphore:
+            response = await acall_with_retry(
+                lambda: cast(BaseLanguageModel, self.model).ainvoke(prompt),
+                retry_on=self.transient_errors,
+                max_retries=self.max_retries,
+                rate_limiter=self.rate_limiter,
+            )
+        return AbstractLLM.response_text(response)
+
+    async def ainvoke_all(self, prompts: List[list]) -> List[str]:
+        """
+        Invoke the model for all the prompts concurrently.
+        """
+        semaphore = asyncio.Semaphore(max(self.num_threads, 1))
+        return await asyncio.gather(
+            *(self.ainvoke(prompt, semaphore) for prompt in prompts)
+        )
+
+    def gen_summaries(self, docs_or_texts: List[Union[Document, str]]) -> List[str]:
+        if self.use_case != "generation":
+            raise ValueError("Cannot generate summary using non-generative model.")
+
+        prompts = [self.summary_prompt(doc_or_text) for doc_or_text in docs_or_texts]
+        return self.run(self.ainvoke_all(prompts))
+
+    def rerank_prompt(self, query: str, chunk: Document) -> list:
+        """
+        Create the prompt for scoring the relevance of the chunk to the query.
+        """
+        return [
+            HumanMessage(
+                content=f"""
+                    {self.rerank_msg}
+
+                    Query:
+                    {query}
+
+                    Chunk:
+                    {chunk}
+                    """
+            ),
+        ]
+
+    @staticmethod
+    def sort_by_scores(chunks: List[Document], responses: List[str]) -> List[Document]:
+        """
+        Sort the chunks by the relevance scores the model responded with.
+        """
+        scored_chunks = []
+        for chunk, response in zip(chunks, responses):
             try:
-                score = float(response.content.strip())
+                score = float(response)
             except ValueError:
                 score = 0.0  # Default score if parsing fails
             scored_chunks.append((chunk, score))
@@ -80,9 +207,91 @@ class OpenAIHandler(AbstractLLM):
         scored_chunks.sort(key=lambda x: x[1], reverse=True)
         return [chunk for chunk, score in scored_chunks]
 
-    def generate(self, query: str, chunks: List[Document]) -> str:
+    def listwise_rerank_prompt(self, query: str, chunks: List[Document]) -> list:
+        """
+        Create the prompt for ranking the (numbered) chunks by their relevance
+        to the query.
+        """
+        numbered_chunks = "\n\n".join(
+            f"[{num}] {chunk.page_content}" for num, chunk in enumerate(chunks, 1)
+        )
+        return [
+            HumanMessage(
+                content=f"""
+                    {self.rerank_listwise_msg}
+
+                    Query:
+                    {query}
+
+                    Documents:
+                    {numbered_chunks}
+                    """
+            ),
+        ]
+
+    @staticmethod
+    def parse_permutation(response: str, num_chunks: int) -> List[int]:
+        """
+        Parse the ranking from the response of the model, such as:
+            [2] > [3] > [1]
+
+        Invalid and repeated numbers are ignored, while the chunks missing
+        from the ranking keep their relative order, after the ranked ones.
+
+        Returns:
+            List[int]: Permutation of the (0-based) indices of the chunks.
+        """
+        permutation: List[int] = []
+        for num in re.findall(r"\d+", response):
+            idx = int(num) - 1
+            if 0 <= idx < num_chunks and idx not in permutation:
+                permutation.append(idx)
+
+        return permutation + [
+            idx for idx in range(num_chunks) if idx not in permutation
+        ]
+
+    def rerank_windows(self, num_chunks: int) -> List[Tuple[int, int]]:
+        """
+        Get the (start, end) windows of chunks to rank, one per request.
+        Windows slide from the back to the front of the list, overlapping, so
+        relevant chunks are carried towards the front.
+        """
+        if num_chunks <= 1:
+            return []  # Nothing to rank
+
+        size = self.rerank_window_size
+        step = min(self.rerank_window_step, size)
+        windows = []
+        end = num_chunks
+        while True:
+            start = max(end - size, 0)
+            windows.append((start, end))
+            if start == 0:
+                return windows
+            end -= step
+
+    def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
+        if self.rerank_mode == "pointwise":
+            responses = [
+                self.invoke(self.rerank_prompt(query, chunk)) for chunk in chunks
+            ]
+            return OpenAIHandler.sort_by_scores(chunks, responses)
+
+        chunks = list(chunks)
+        for start, end in self.rerank_windows(len(chunks)):
+            window = chunks[start:end]
+            response = self.invoke(self.listwise_rerank_prompt(query, window))
+            permutation = OpenAIHandler.parse_permutation(response, len(window))
+            chunks[start:end] = [window[idx] for idx in permutation]
+        return chunks
+
+    def generate_prompt(self, query: str, chunks: List[Document]) -> list:
+        """
+        Create the prompt for answering the query, based on the chunks.
+        """
         concat_chunks = "\n\n".join([ch.page_content for ch in chunks])
-        prompt = [
+        return [
             HumanMessage(
                 content=f"""
                     {self.generate_msg}
@@ -95,5 +304,6 @@ class OpenAIHandler(AbstractLLM):
                     """
             ),
         ]
-        response = self.model.invoke(prompt)
-        return response.content.strip()
+
+    def generate(self, query: str, chunks: List[Document]) -> str:
+        return self.invoke(self.generate_prompt(query, chunks))
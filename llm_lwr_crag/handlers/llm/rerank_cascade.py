@@ -0,0 +1,40 @@
+from typing import List, Optional, Tuple
+
+from handlers.db import AbstractDB
+from langchain.schema import Document
+
+from .abstract_llm import AbstractLLM
+
+
+class RerankCascade(AbstractLLM):
+    """
+    Cascade of rerankers, from the cheapest to the most expensive one.
+
+    Every stage reranks the chunks that survived the previous one, and keeps
+    (at most) the chunks of its top `top_n` files - so expensive rerankers
+    (e.g. LLMs) only see a fraction of the candidates.
+    """
+
+    def __init__(self, stages: List[Tuple[AbstractLLM, Optional[int]]]):
+        """
+        Args:
+            stages (List[Tuple[AbstractLLM, Optional[int]]]): Rerankers, in
+                the order of application, alongside their cut-offs - number of
+                files kept after them (or None, to keep all of them).
+        """
+        self.use_case = "reranking"
+        self.stages = stages
+
+    def __str__(self):
+        return " -> ".join(
+            str(reranker) if top_n is None else f"{reranker}[:{top_n}]"
+            for reranker, top_n in self.stages
+        )
+
+    def rerank(self, query: str, chunks: List[Document]) -> List[Document]:
+        for reranker, top_n in self.stages:
+            chunks = reranker.rerank(query, chunks)
+            if top_n is not None:
+                _, chunks = AbstractDB.filter_by_fp(chunks, top_k=top_n)
+
+        return chunks
@@ -0,0 +1,169 @@
+from typing import List, Optional
+
+import torch
+from langchain.schema import Document
+from transformers import PreTrainedModel, PreTrainedTokenizerBase
+from utils.disk_cache import cache_key
+from utils.logging import logger
+from utils.lru_cache import LRUCache
+
+from .onnx_backend import PARITY_TEXTS
+
+__all__ = ["RerankEngine", "quantize_reranker"]
+
+# Queries the quantized model is compared against the original one on, each
+# paired with every one of `PARITY_TEXTS`
+PARITY_QUERIES = [
+    "How are two numbers added?",
+    "Where are the documents retrieved for a query?",
+    "How do I install the project?",
+]
+
+
+class RerankEngine:
+    """
+    Cross-encoder reranking engine.
+
+    (query, chunk) pairs are scored in micro-batches of `batch_size`, truncated
+    to `max_length` tokens, so the latency and the peak memory of reranking
+    grow linearly (and predictably) with the number of candidates. Scores are
+    cached by (query, chunk hash), so chunks retrieved again for the same query
+    (e.g. during evaluation sweeps) are not scored twice.
+    """
+
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizerBase,
+        batch_size: int = 16,
+        max_length: int = 512,
+        cache: Optional[LRUCache] = None,
+    ):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = cache
+
+    def score_batch(self, query: str, texts: List[str]) -> torch.Tensor:
+        """
+        Score the relevance of the texts to the query, in a single batch.
+        """
+        feats = self.tokenizer(
+            [query] * len(texts),
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        ).to(self.model.device)
+
+        with torch.inference_mode():
+            logits = self.model(**feats).logits
+        # Models with multiple labels score the relevance with the last one
+        return logits[:, -1].float().cpu()
+
+    def score(self, query: str, texts: List[str]) -> torch.Tensor:
+        """
+        Score the relevance of the texts to the query.
+
+        Returns:
+            torch.Tensor: Scores of the texts, of shape (len(texts),).
+        """
+        scores = torch.empty(len(texts))
+        keys = [cache_key(query, text) for text in texts]
+
+        missing = []
+        for idx, key in enumerate(keys):
+            score = self.cache.get(key) if self.cache is not None else None
+            if score is None:
+                missing.append(idx)
+            else:
+                scores[idx] = score
+
+        for start in range(0, len(missing), self.batch_size):
+            end = start + self.batch_size
+            batch = missing[start:end]
+            batch_scores = self.score_batch(query, [texts[idx] for idx in batch])
+            scores[batch] = batch_scores
+            if self.cache is not None:
+                for idx, score in zip(batch, batch_scores.tolist()):
+                    self.cache.set(keys[idx], score)
+
+        return scores
+
+    def rerank(
+        self, query: str, chunks: List[Document], top_n: Optional[int] = None
+    ) -> List[Document]:
+        """
+        Sort the chunks by their relevance to the query.
+
+        Args:
+            query (str): Query to rerank the chunks for.
+            chunks (List[Document]): Chunks to rerank.
+            top_n (Optional[int]): Number of (most relevant) chunks to keep.
+                If None, all the chunks are kept.
+
+        Returns:
+            List[Document]: Reranked chunks.
+        """
+        if not chunks:
+            return []
+
+        scores = self.score(query, [chunk.page_content for chunk in chunks])
+        top_n = len(chunks) if top_n is None else min(top_n, len(chunks))
+        return [chunks[idx] for idx in torch.topk(scores, top_n).indices.tolist()]
+
+
+def quantize_reranker(
+    engine: RerankEngine,
+    quantization: str,
+    min_similarity: float = 0.99,
+) -> Optional[RerankEngine]:
+    """
+    Quantize the (CPU) cross-encoder of the engine dynamically to int8 - the
+    weights of linear layers are stored as int8, while activations are
+    quantized on the fly.
+
+    Scores of the quantized model are checked against the ones of the
+    original model, on a fixed set of (query, text) pairs.
+
+    Args:
+        engine (RerankEngine): Engine of the original model.
+        quantization (str): CPU architecture to quantize for ("arm64" uses the
+            QNNPACK kernels, others FBGEMM).
+        min_similarity (float): Minimum correlation between the scores of the
+            quantized and the original model.
+
+    Returns:
+        Optional[RerankEngine]: Engine of the quantized model, or None if it
+            fails the parity check.
+    """
+    torch.backends.quantized.engine = "qnnpack" if quantization == "arm64" else "fbgemm"
+    model = torch.quantization.quantize_dynamic(
+        engine.model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    quantized = RerankEngine(
+        model,
+        engine.tokenizer,
+        batch_size=engine.batch_size,
+        max_length=engine.max_length,
+        cache=engine.cache,
+    )
+
+    expected = torch.cat(
+        [engine.score_batch(query, PARITY_TEXTS) for query in PARITY_QUERIES]
+    )
+    actual = torch.cat(
+        [quantized.score_batch(query, PARITY_TEXTS) for query in PARITY_QUERIES]
+    )
+    similarity = float(torch.corrcoef(torch.stack([expected, actual]))[0, 1])
+    if similarity < min_similarity:
+        logger.warning(
+            f"Quantized reranker failed the parity check "
+            f"(score correlation {similarity:.4f} < {min_similarity})."
+        )
+        return None
+
+    logger.info(f"Quantized reranker to int8 (score correlation {similarity:.4f}).")
+    return quantized
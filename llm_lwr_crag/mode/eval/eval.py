@@ -57,4 +57,8 @@ def eval(args: Box) -> None:
         },
     )
 
+    query_cache = args.retriever.db.emb_func.query_cache
+    if query_cache is not None:
+        logger.info(f"Query embedding cache: {query_cache.stats()}")
+
     logger.info(f"{avg_recall * 100:.2f}")
@@ -1,23 +1,27 @@
-from typing import List, Set, Tuple, Union
+from typing import List, Optional, Set, Tuple, Union
 
 import pandas as pd
 import utils.pipeline as pl
 from box import Box
 from handlers import AbstractDB, AbstractLLM
 from langchain.schema import Document
+from utils.chunk_store import ChunkStore
 from utils.logging import log_tc
+from utils.stream import CountingIterator
 
 
 class Retriever:
     def __init__(
         self,
         ret_vec_db: AbstractDB,
-        ret_db_bm25: AbstractDB,
-        ret_rerank: AbstractLLM,
+        ret_db_bm25: Optional[AbstractDB],
+        ret_rerank: Optional[AbstractLLM],
+        fetch_factor: int = 4,
     ):
         self.vec_db = ret_vec_db
         self.bm25 = ret_db_bm25
         self.rerank = ret_rerank
+        self.fetch_factor = fetch_factor
 
     def __call__(self, query: str, k: int = 10) -> Tuple[List[str], List[Document]]:
         """
@@ -32,9 +36,9 @@ class Retriever:
                 and chunks.
         """
         # Query the database to get top-K relevant files
-        # Corrective factor of 4 used as an example - can be changed
-        # as it is a hyperparameter
-        ret_chunks = self.vec_db.query(query, k=4 * k)
+        # Multiple chunks may come from the same file, therefore more chunks
+        # are fetched (`fetch_factor` is a hyperparameter)
+        ret_chunks = self.vec_db.query(query, k=self.fetch_factor * k)
         ret_fps = None
 
         # Apply BM25, if applicable
@@ -88,11 +92,12 @@ class RAG:
     def __init__(
         self,
         ret_vec_db: AbstractDB,
-        ret_db_bm25: AbstractDB,
-        ret_rerank: AbstractLLM,
+        ret_db_bm25: Optional[AbstractDB],
+        ret_rerank: Optional[AbstractLLM],
         gen_llm: AbstractLLM,
+        fetch_factor: int = 4,
     ):
-        self.retriever = Retriever(ret_vec_db, ret_db_bm25, ret_rerank)
+        self.retriever = Retriever(ret_vec_db, ret_db_bm25, ret_rerank, fetch_factor)
         self.generator = Generator(gen_llm)
 
     def __call__(
@@ -143,21 +148,32 @@ class RAG:
         return recall, ret_relevant
 
     @staticmethod
-    def from_args(args: Box, docs: List[Document], chunks: List[Document]):
+    def from_args(
+        args: Box,
+        docs: Union[List[Document], CountingIterator[Document]],
+        chunks: Union[ChunkStore, CountingIterator[Document]],
+    ):
         """
         Initialize `RAG` object given arguments, and documents / chunks.
 
         Args:
             args (Box): A wrapped-up parsed YAML arguments.
-            docs (List[Document])
-            chunks (List[Document])
+            docs (Union[List[Document], CountingIterator[Document]])
+            chunks (Union[ChunkStore, CountingIterator[Document]]): Both are
+                one-shot iterators, when streaming.
 
         Returns:
             RAG
         """
         ret_vec_db, ret_db_bm25, ret_rerank = pl.setup_retrieval(args, docs, chunks)
         gen_llm = pl.setup_generation(args)
-        return RAG(ret_vec_db, ret_db_bm25, ret_rerank, gen_llm)
+        return RAG(
+            ret_vec_db,
+            ret_db_bm25,
+            ret_rerank,
+            gen_llm,
+            fetch_factor=args.retriever.fetch_factor,
+        )
 
     def eval(self, eval_df: pd.DataFrame, k: int = 10) -> float:
         """
@@ -0,0 +1,22 @@
+from typing import List
+
+from langchain.schema import Document
+
+__all__ = ["chunk_fps"]
+
+
+def chunk_fps(chunk: Document) -> List[str]:
+    """
+    Get all the file paths the chunk belongs to: its own file path, followed
+    by the paths of identical files, deduplicated during loading.
+
+    Args:
+        chunk (Document): Chunk to get the file paths of.
+
+    Returns:
+        List[str]: File paths of the chunk.
+    """
+    aliases = chunk.metadata.get("aliases", None)
+    if not aliases:
+        return [chunk.metadata["rel_path"]]
+    return [chunk.metadata["rel_path"], *aliases.split("\n")]
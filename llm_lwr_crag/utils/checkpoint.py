@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from .logging import logger
+
+__all__ = ["Checkpoint"]
+
+
+class Checkpoint:
+    """
+    Append-only key-value store, saved as a JSON Lines file.
+    Each finished item is written (and flushed) as soon as it is added, so an
+    interrupted job can be resumed, skipping the items already done.
+    """
+
+    def __init__(self, checkpoint_path: str):
+        self.checkpoint_path = str(checkpoint_path)
+        self.items: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line may be cut, if the job was interrupted
+                        continue
+                    self.items[item["key"]] = item["value"]
+            logger.info(
+                f"Loaded {len(self.items)} finished items from {self.checkpoint_path}"
+            )
+        else:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True
+            )
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.items
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.items.get(key)
+
+    def add(self, key: str, value: Any) -> None:
+        """
+        Store the item, and append it to the checkpoint file.
+        """
+        line = json.dumps({"key": key, "value": value})
+        with self.lock:
+            self.items[key] = value
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
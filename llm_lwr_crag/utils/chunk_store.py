@@ -0,0 +1,220 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union, overload
+
+from langchain.schema import Document
+
+__all__ = ["ChunkStore"]
+
+
+class ChunkStore(Sequence[Document]):
+    """
+    Compact, column-oriented store of chunks.
+
+    Instead of a `Document` (with its own copy of the text and of the
+    metadata) per chunk, the store keeps:
+        (1) the content of every document, as a text buffer, shared with the
+            document itself (not copied);
+        (2) metadata of every document, stored once and shared by all of its
+            chunks (file path, extension, hash, ...);
+        (3) array-backed columns with, for every chunk, its document and the
+            span (offset, length) of its text within a buffer, along with its
+            lines (for code chunks);
+        (4) chunk-specific metadata (e.g. aliases), only for the few chunks
+            that have it.
+    Chunks that are not a part of their document's content (e.g. generated by
+    an LLM) get a buffer of their own.
+
+    `Document` objects are only materialized on access, each with its own
+    (copied) metadata, so chunks never share mutable state.
+    """
+
+    def __init__(self):
+        # Per-document columns
+        self.doc_metadata: List[dict] = []
+        self.doc_buffer = array("I")
+
+        # Text buffers - document contents, and chunks of their own
+        self.buffers: List[str] = []
+
+        # Per-chunk columns
+        self.chunk_doc = array("I")
+        self.chunk_buffer = array("I")
+        self.chunk_offset = array("Q")
+        self.chunk_length = array("Q")
+        self.chunk_start_line = array("I")  # 0 if unknown
+        self.chunk_end_line = array("I")  # 0 if unknown
+
+        # Chunk-specific metadata: chunk index -> metadata
+        self.chunk_metadata: Dict[int, dict] = {}
+
+    def add_document(self, doc: Document) -> int:
+        """
+        Register a document, whose chunks are to be added.
+
+        Args:
+            doc (Document): Document to register.
+
+        Returns:
+            int: Index of the document within the store.
+        """
+        self.buffers.append(doc.page_content)
+        self.doc_buffer.append(len(self.buffers) - 1)
+        self.doc_metadata.append(doc.metadata)
+        return len(self.doc_metadata) - 1
+
+    def add_chunks(self, doc_idx: int, splits: List[Tuple[str, dict]]) -> None:
+        """
+        Add chunks of the registered document.
+
+        Args:
+            doc_idx (int): Index of the document the splits come from.
+            splits (List[Tuple[str, dict]]): Texts of the chunks, alongside the
+                metadata specific to them (e.g. line offsets).
+        """
+        buffer_idx = self.doc_buffer[doc_idx]
+        content = self.buffers[buffer_idx]
+
+        # Splits follow the order of the content, so searching from the last
+        # found split keeps the whole search linear
+        search_from = 0
+        for split, split_metadata in splits:
+            offset = content.find(split, search_from)
+            if offset == -1:
+                offset = content.find(split)
+
+            if offset == -1:
+                # Not a part of the content, keep the text as a buffer of its own
+                self.buffers.append(split)
+                self.chunk_buffer.append(len(self.buffers) - 1)
+                self.chunk_offset.append(0)
+            else:
+                self.chunk_buffer.append(buffer_idx)
+                self.chunk_offset.append(offset)
+                search_from = offset
+
+            self.chunk_doc.append(doc_idx)
+            self.chunk_length.append(len(split))
+
+            split_metadata = dict(split_metadata)
+            self.chunk_start_line.append(split_metadata.pop("start_line", 0))
+            self.chunk_end_line.append(split_metadata.pop("end_line", 0))
+            if split_metadata:
+                self.chunk_metadata[len(self.chunk_doc) - 1] = split_metadata
+
+    def append(self, chunk: Document) -> None:
+        """
+        Add a standalone chunk, spanning the whole content of a document.
+        """
+        self.add_chunks(self.add_document(chunk), [(chunk.page_content, {})])
+
+    def extend(self, chunks: Iterable[Document]) -> None:
+        """
+        Add the chunks. Chunks of another store are added without
+        materializing them.
+        """
+        if isinstance(chunks, ChunkStore):
+            self.merge(chunks)
+            return
+
+        for chunk in chunks:
+            self.append(chunk)
+
+    def merge(self, other: "ChunkStore") -> None:
+        """
+        Add all the chunks of another store, sharing its buffers and document
+        metadata.
+        """
+        num_docs, num_buffers, num_chunks = (
+            len(self.doc_metadata),
+            len(self.buffers),
+            len(self),
+        )
+
+        self.doc_metadata += other.doc_metadata
+        self.doc_buffer.extend(idx + num_buffers for idx in other.doc_buffer)
+        self.buffers += other.buffers
+
+        self.chunk_doc.extend(idx + num_docs for idx in other.chunk_doc)
+        self.chunk_buffer.extend(idx + num_buffers for idx in other.chunk_buffer)
+        self.chunk_offset += other.chunk_offset
+        self.chunk_length += other.chunk_length
+        self.chunk_start_line += other.chunk_start_line
+        self.chunk_end_line += other.chunk_end_line
+        self.chunk_metadata.update(
+            {idx + num_chunks: dict(md) for idx, md in other.chunk_metadata.items()}
+        )
+
+    def subset(self, indices: Iterable[int]) -> "ChunkStore":
+        """
+        Create a store of the chunks at given indices, sharing the buffers and
+        document metadata with this store.
+        """
+        store = ChunkStore()
+        store.doc_metadata = list(self.doc_metadata)
+        store.doc_buffer = array("I", self.doc_buffer)
+        store.buffers = list(self.buffers)
+
+        for idx in indices:
+            if idx in self.chunk_metadata:
+                store.chunk_metadata[len(store)] = dict(self.chunk_metadata[idx])
+            store.chunk_doc.append(self.chunk_doc[idx])
+            store.chunk_buffer.append(self.chunk_buffer[idx])
+            store.chunk_offset.append(self.chunk_offset[idx])
+            store.chunk_length.append(self.chunk_length[idx])
+            store.chunk_start_line.append(self.chunk_start_line[idx])
+            store.chunk_end_line.append(self.chunk_end_line[idx])
+
+        return store
+
+    def text(self, idx: int) -> str:
+        """
+        Get the text of the chunk, without materializing the `Document`.
+        """
+        start = self.chunk_offset[idx]
+        end = start + self.chunk_length[idx]
+        buffer = self.buffers[self.chunk_buffer[idx]]
+        if start == 0 and end == len(buffer):
+            return buffer
+        return buffer[start:end]
+
+    def metadata(self, idx: int) -> dict:
+        """
+        Get (a copy of) the metadata of the chunk.
+        """
+        metadata = dict(self.doc_metadata[self.chunk_doc[idx]])
+        if self.chunk_start_line[idx]:
+            metadata["start_line"] = self.chunk_start_line[idx]
+            metadata["end_line"] = self.chunk_end_line[idx]
+        metadata.update(self.chunk_metadata.get(idx, {}))
+        return metadata
+
+    def set_metadata(self, idx: int, key: str, value) -> None:
+        """
+        Set a piece of metadata specific to the chunk.
+        """
+        self.chunk_metadata.setdefault(idx, {})[key] = value
+
+    def __len__(self) -> int:
+        return len(self.chunk_doc)
+
+    @overload
+    def __getitem__(self, idx: int) -> Document: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[Document]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Document, List[Document]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        idx = int(idx)  # May be a NumPy integer
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Chunk index out of range.")
+
+        return Document(page_content=self.text(idx), metadata=self.metadata(idx))
+
+    def __iter__(self) -> Iterator[Document]:
+        for idx in range(len(self)):
+            yield self[idx]
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+from .logging import logger
+
+__all__ = ["RateLimiter", "call_with_retry", "acall_with_retry"]
+
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter of the number of requests per minute.
+    Requests are spaced out evenly, i.e. `acquire` blocks until the next
+    request slot is available.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve the next request slot.
+
+        Returns:
+            float: Time (in seconds) to wait until the slot.
+        """
+        if not self.interval:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+
+        return slot - now
+
+    def acquire(self) -> None:
+        """
+        Block until a request can be sent.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """
+        Wait (without blocking the event loop) until a request can be sent.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def retry_delay(attempt: int, backoff: float, max_backoff: float) -> float:
+    """
+    Exponential backoff, with jitter (so concurrent retries spread out).
+    """
+    return min(backoff * 2**attempt, max_backoff) * random.uniform(0.5, 1.0)
+
+
+def call_with_retry(
+    func: Callable[[], T],
+    retry_on: Tuple[Type[BaseException], ...] = (),
+    max_retries: int = 5,
+    rate_limiter: Optional[RateLimiter] = None,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+) -> T:
+    """
+    Call the function, retrying on transient failures with exponential backoff
+    (and jitter).
+
+    Args:
+        func (Callable[[], T]): Function to call.
+        retry_on (Tuple[Type[BaseException], ...]): Exceptions considered
+            transient. Any other exception is raised immediately.
+        max_retries (int): Maximum number of retries, before giving up.
+        rate_limiter (Optional[RateLimiter]): If provided, every attempt waits
+            for its request slot.
+        backoff (float): Delay (in seconds) before the first retry.
+        max_backoff (float): Maximum delay between two attempts.
+
+    Returns:
+        T: Result of the function.
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        try:
+            return func()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+
+            delay = retry_delay(attempt, backoff, max_backoff)
+            logger.warning(
+                f"Transient failure ({type(e).__name__}), "
+                f"retrying in {delay:.1f}s ({attempt + 1}/{max_retries})..."
+            )
+            time.sleep(delay)
+
+    raise RuntimeError("Unreachable")  # pragma: no cover
+
+
+async def acall_with_retry(
+    func: Callable[[], Awaitable[T]],
+    retry_on: Tuple[Type[BaseException], ...] = (),
+    max_retries: int = 5,
+    rate_limiter: Optional[RateLimiter] = None,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+) -> T:
+    """
+    Asynchronous counterpart of `call_with_retry`.
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async()
+
+        try:
+            return await func()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+
+            delay = retry_delay(attempt, backoff, max_backoff)
+            logger.warning(
+                f"Transient failure ({type(e).__name__}), "
+                f"retrying in {delay:.1f}s ({attempt + 1}/{max_retries})..."
+            )
+            await asyncio.sleep(delay)
+
+    raise RuntimeError("Unreachable")  # pragma: no cover
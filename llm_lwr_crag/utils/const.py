@@ -11,7 +11,7 @@ __all__ = [
 
 SUPPORTED_MODE = ["eval"]
 SUPPORTED_DB = ["chromadb"]
-SUPPORTED_RETRIEVER_LLM = ["hf", "openai"]
+SUPPORTED_RETRIEVER_LLM = ["hf", "openai", "openai_async"]
 
 DEFAULT_ARGS = Box(
     {
@@ -20,44 +20,112 @@ DEFAULT_ARGS = Box(
         "retriever": {
             "eval": {
                 "augment_query": None,
+                "augment_cache_path": "$PERSIST_DIR/augment_cache.sqlite",
+                "num_workers": 8,
+            },
+            "loading": {
+                "exclude": [
+                    # Never part of the sources - excluded at any depth
+                    ".git/",
+                    "node_modules/",
+                    "bower_components/",
+                    "__pycache__/",
+                    ".venv/",
+                    "venv/",
+                    ".tox/",
+                    ".mypy_cache/",
+                    ".pytest_cache/",
+                    ".idea/",
+                    ".vscode/",
+                    # Vendored code / build outputs - only at the repository
+                    # root, as nested directories of these names may be sources
+                    "/vendor/",
+                    "/third_party/",
+                    "/build/",
+                    "/dist/",
+                    "/target/",
+                    "/out/",
+                ],
+                "gitignore": True,
+                "max_file_size": 10_000_000,
+                "window_size": 1_000_000,
+                "skip_generated": True,
+                "dedup": True,
+                "executor": "thread",
+                "num_workers": None,
+                "process_chunksize": 64,
+                "streaming": False,
+                "queue_size": 256,
+                "batch_size": 128,
             },
             "metadata": {
                 "list": [],
                 "llm_summary": None,
+                "summary_cache_path": "$PERSIST_DIR/summary_cache.sqlite",
+                "summary_cache_max_size": 256_000_000,
+                "batch_size": 64,
+                "code_structure_max_size": 1_000_000,
+                "code_structure_time_budget": 1.0,
             },
             "chunking": {
                 "type": "RecursiveCharacterTextSplitter",
                 "metadata": [],
                 "chunk_size": 500,
                 "chunk_overlap": 50,
+                "num_workers": None,
                 "llm_setup": None,
+                "checkpoint_path": "$PERSIST_DIR/llm_chunking_checkpoint.jsonl",
+                "dedup_threshold": None,
             },
             "db": {
                 # ChromaDB
                 "provider": "chromadb",
                 "collection_name": "default_collection",
                 "persist_dir": "$PERSIST_DIR/",
+                "incremental": False,
             },
             "llm": {
                 "provider": "hf",
                 # General API
                 "api_key": None,
+                "base_url": None,
                 "device": "cuda",
+                "max_batch_tokens": 16384,
+                "num_workers": None,
+                "backend": "torch",
+                "onnx_dir": "$PERSIST_DIR/onnx/",
+                "quantization": None,
+                "parity_min_similarity": 0.99,
                 "model_name": "sentence-transformers/all-MiniLM-L6-v2",
                 # OpenAI
                 "batch_size": 16,
                 "num_threads": 12,
+                "requests_per_minute": None,
+                "max_retries": 5,
+                "embedding_cache_dir": "$PERSIST_DIR/embedding_cache/",
+                "query_cache_size": 1024,
+                "query_cache_ttl": None,
                 "use_case": "embedding",
                 "split_text_system_msg": "$PROMPTS_DIR/split_text_sys_default.txt",
                 "split_text_human_msg": "$PROMPTS_DIR/split_text_hmn_default.txt",
+                "split_text_max_tokens": 4096,
                 "summarize_msg": "$PROMPTS_DIR/summarize_msg.txt",
                 "augment_msg": "$PROMPTS_DIR/augment_msg.txt",
                 "rerank_msg": "$PROMPTS_DIR/rerank_msg.txt",
+                "rerank_listwise_msg": "$PROMPTS_DIR/rerank_listwise_msg.txt",
+                "rerank_mode": "pointwise",
+                "rerank_window_size": 30,
+                "rerank_window_step": 15,
+                "rerank_batch_size": 16,
+                "rerank_max_length": 512,
+                "rerank_cache_size": 4096,
+                "rerank_top_n": None,
                 "generate_msg": "$PROMPTS_DIR/generate_msg.txt",
             },
+            "fetch_factor": 4,
             "rerank": {
                 "provider": "hf",
-                "model_name": "cross-encoder/msmarco-MiniLM-L6-cos-v5",
+                "model_name": "cross-encoder/ms-marco-MiniLM-L6-v2",
                 "use_case": "reranking",
             },
         },
@@ -76,6 +144,7 @@ REQUIRED_ARGS = Box(
             "chunking": {
                 "type": {
                     "RecursiveCharacterTextSplitter": [],
+                    "CodeChunking": [],
                     "LLMChunking": ["llm_setup"],
                 },
             },
@@ -89,6 +158,7 @@ REQUIRED_ARGS = Box(
                 "provider": {
                     "hf": ["model_name", "device"],
                     "openai": ["model_name"],
+                    "openai_async": ["model_name"],
                 },
             },
         },
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from .logging import logger
+
+__all__ = ["DiskCache", "cache_key"]
+
+
+def cache_key(*parts: Optional[str]) -> str:
+    """
+    Hash the given parts into a single, content-addressed cache key.
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update((part or "").encode("utf-8", errors="ignore"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key-value (string) cache, backed by SQLite.
+
+    Safe to use from multiple threads (each thread gets its own connection)
+    and processes (the database is in WAL mode). Once the total size of the
+    stored values exceeds `max_size` bytes, least recently used entries are
+    evicted.
+    """
+
+    # Fraction of `max_size` the cache is shrunk to, once full - evicting in
+    # bulk, instead of on every insertion
+    EVICT_TO = 0.9
+
+    def __init__(self, cache_path: Union[str, Path], max_size: Optional[int] = None):
+        self.cache_path = str(cache_path)
+        self.max_size = max_size
+        self.local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with self.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+            )
+
+            # Total size of the values, kept up to date by the triggers, so it
+            # is not recomputed on every insertion
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_size (total INTEGER)")
+            conn.execute(
+                "INSERT INTO cache_size SELECT (SELECT COALESCE(SUM(size), 0) "
+                "FROM cache) WHERE NOT EXISTS (SELECT 1 FROM cache_size)"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache "
+                "BEGIN UPDATE cache_size SET total = total + NEW.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size "
+                "ON cache BEGIN "
+                "UPDATE cache_size SET total = total + NEW.size - OLD.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache "
+                "BEGIN UPDATE cache_size SET total = total - OLD.size; END"
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection of the current thread.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the cached value, or None if the key is not cached.
+        """
+        conn = self.connection()
+        row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Cache the value, evicting least recently used entries if the cache is
+        full.
+        """
+        conn = self.connection()
+        with conn:
+            # Upsert (rather than replace), so the triggers see the old size
+            conn.execute(
+                "INSERT INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                "size = excluded.size, accessed = excluded.accessed",
+                (key, value, len(value.encode("utf-8")), time.time()),
+            )
+
+        if self.max_size is not None:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Evict least recently used entries, if the cache exceeds its size.
+        """
+        max_size = self.max_size
+        if max_size is None:
+            return
+
+        conn = self.connection()
+        with conn:
+            (total_size,) = conn.execute("SELECT total FROM cache_size").fetchone()
+            if total_size <= max_size:
+                return
+
+            # Find the access time, up to which entries have to be removed
+            to_free = total_size - int(max_size * DiskCache.EVICT_TO)
+            freed, evict_until = 0, None
+            for size, accessed in conn.execute(
+                "SELECT size, accessed FROM cache ORDER BY accessed"
+            ):
+                freed += size
+                evict_until = accessed
+                if freed >= to_free:
+                    break
+
+            conn.execute("DELETE FROM cache WHERE accessed <= ?", (evict_until,))
+            logger.info(f"Evicted {freed} bytes from the cache at {self.cache_path}")
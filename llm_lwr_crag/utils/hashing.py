@@ -0,0 +1,16 @@
+import hashlib
+
+__all__ = ["hash_text"]
+
+
+def hash_text(text: str) -> str:
+    """
+    Hash the textual content of a file.
+
+    Args:
+        text (str): Content to hash.
+
+    Returns:
+        str: SHA-256 hex digest of the (UTF-8 encoded) content.
+    """
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ["LRUCache"]
+
+T = TypeVar("T")
+
+
+class LRUCache(Generic[T]):
+    """
+    Thread-safe, in-memory cache of bounded size.
+
+    Once full, the least recently used entry is evicted. If `ttl` is provided,
+    entries older than `ttl` seconds are considered expired (and evicted on
+    access). Hits and misses are counted, to monitor the cache's usefulness.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """
+        Get the cached value, or None if the key is not cached (or expired).
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None:
+                if time.monotonic() - entry[0] > self.ttl:
+                    del self.entries[key]
+                    entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: T) -> None:
+        """
+        Cache the value, evicting the least recently used entry if full.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses "
+            f"({hit_rate * 100:.2f}% hit rate), {len(self.entries)} entries"
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,16 +1,28 @@
-from typing import List, Tuple
+from typing import Collection, List, Optional, Sequence, Tuple, Union, cast
 
 import pandas as pd
 from box import Box
 from data_processing import (
     chunk_docs,
+    dedup_chunks,
+    iter_chunks,
+    iter_docs,
     load_docs,
     make_text_chunker,
     preprocess_eval,
 )
-from handlers import AbstractDB, AbstractLLM, AutoDB, AutoLLM
+from handlers import (
+    AbstractDB,
+    AbstractLLM,
+    AutoDB,
+    AutoLLM,
+    IndexManifest,
+    RerankCascade,
+)
 from langchain.schema import Document
 from utils import download_repo, gen_extensions, logger, parse_eval, path
+from utils.chunk_store import ChunkStore
+from utils.stream import CountingIterator, batched, prefetch
 
 
 def make_repo_and_eval(args: Box) -> pd.DataFrame:
@@ -33,18 +45,31 @@ def make_repo_and_eval(args: Box) -> pd.DataFrame:
     return eval_df
 
 
-def load_docs_and_chunk(args: Box) -> Tuple[List[Document], List[Document]]:
+def load_docs_and_chunk(
+    args: Box,
+) -> Union[
+    Tuple[List[Document], ChunkStore],
+    Tuple[CountingIterator[Document], CountingIterator[Document]],
+]:
     """
     Load the documents (downloaded as a part of GitHub repository) and chunk them.
+    In case of incremental indexing, only new or modified documents are chunked.
+    When streaming, nothing is loaded yet - check `stream_docs_and_chunk`.
 
     Args:
         args (Box)
 
     Returns:
-        docs, chunks (Tuple[List[Document], List[Document]]): A tuple consisting of:
-            (1) docs (List[Document]): List of valid, loaded documents, wrapped into
+        docs, chunks (Union[Tuple[List[Document], ChunkStore],
+        Tuple[CountingIterator[Document], CountingIterator[Document]]]):
+        A tuple consisting of:
+            (1) docs: List of valid, loaded documents, wrapped into
                 `langchain.schema.Document` objects.
-            (2) chunks (List[Document]): List of chunks, from given documents.
+            (2) chunks: Store of chunks, from given documents
+                (from new or modified documents only, if indexing incrementally),
+                materialized as `Document` objects on access.
+            When streaming, both are one-shot iterators instead - they can be
+            consumed only once.
     """
     extensions = gen_extensions(
         path(args.languages_path),
@@ -52,14 +77,124 @@ def load_docs_and_chunk(args: Box) -> Tuple[List[Document], List[Document]]:
         force=True,
     )
 
-    docs = load_docs(path(args.repo_dir), extensions, args.retriever.metadata)
+    if args.retriever.loading.streaming:
+        return stream_docs_and_chunk(args, extensions)
+
+    docs = load_docs(
+        path(args.repo_dir),
+        extensions,
+        args.retriever.metadata,
+        args.retriever.loading,
+    )
+
+    docs_to_chunk = docs
+    if args.retriever.db.incremental:
+        docs_to_chunk, stale_fps = IndexManifest.from_args(args).diff(docs)
+        logger.info(
+            f"Incremental indexing: {len(docs_to_chunk)} new or modified files, "
+            f"{len(stale_fps)} files with outdated chunks."
+        )
+
+    text_chunker = make_text_chunker(args.retriever.chunking)
+    chunks = chunk_docs(
+        docs_to_chunk,
+        text_chunker,
+        num_workers=args.retriever.chunking.num_workers,
+        checkpoint_path=args.retriever.chunking.checkpoint_path,
+    )
+
+    # Chunks of incrementally indexed files are tracked per file, therefore
+    # they cannot be shared (as aliases) between files
+    if args.retriever.chunking.dedup_threshold and not args.retriever.db.incremental:
+        chunks = dedup_chunks(chunks, threshold=args.retriever.chunking.dedup_threshold)
+
+    return docs, chunks
+
+
+def stream_docs_and_chunk(
+    args: Box, extensions: Collection[str]
+) -> Tuple[CountingIterator[Document], CountingIterator[Document]]:
+    """
+    Set up the streaming load -> chunk pipeline.
+    Each stage runs in the background and is connected to the next one via a
+    bounded queue, so chunks are available (e.g. for embedding) while the
+    repository is still being walked, and the memory usage stays flat.
+    Nothing is loaded until the chunks are consumed.
+
+    Args:
+        args (Box)
+        extensions (Collection[str]): Allowed extensions to load.
+
+    Returns:
+        docs, chunks (Tuple[CountingIterator[Document], CountingIterator[Document]]):
+            One-shot streams of loaded documents (consumed by chunking) and
+            chunks. Their `len()` reports the number of items streamed so far.
+    """
+    loading_args = args.retriever.loading
+
+    docs = CountingIterator(
+        prefetch(
+            iter_docs(
+                path(args.repo_dir),
+                extensions,
+                args.retriever.metadata,
+                loading_args,
+            ),
+            maxsize=loading_args.queue_size,
+        )
+    )
 
     text_chunker = make_text_chunker(args.retriever.chunking)
-    chunks = chunk_docs(docs, text_chunker)
+    chunks = CountingIterator(
+        prefetch(
+            iter_chunks(
+                docs,
+                text_chunker,
+                checkpoint_path=args.retriever.chunking.checkpoint_path,
+            ),
+            maxsize=loading_args.queue_size,
+        )
+    )
 
     return docs, chunks
 
 
+def index_chunks(
+    args: Box,
+    ret_db_vec: AbstractDB,
+    docs: List[Document],
+    chunks: Sequence[Document],
+) -> None:
+    """
+    Incrementally update the vector database with the chunks of new or
+    modified documents. Outdated chunks (of modified or deleted documents) are
+    removed, and the index manifest is updated accordingly.
+
+    Args:
+        args (Box)
+        ret_db_vec (AbstractDB): Vector database to update.
+        docs (List[Document]): Complete list of loaded documents.
+        chunks (Sequence[Document]): Chunks of new or modified documents
+            (e.g. a `ChunkStore`).
+
+    Returns:
+        None
+    """
+    manifest = IndexManifest.from_args(args)
+    changed_docs, stale_fps = manifest.diff(docs)
+
+    ret_db_vec.delete(manifest.stale_chunk_ids(stale_fps))
+
+    chunk_ids = IndexManifest.chunk_ids(chunks)
+    for batch in batched(zip(chunks, chunk_ids), args.retriever.loading.batch_size):
+        batch_chunks, batch_ids = zip(*batch)
+        ret_db_vec.add_documents(list(batch_chunks), ids=list(batch_ids))
+    ret_db_vec.persist()
+
+    manifest.update(stale_fps, changed_docs, chunks, chunk_ids)
+    manifest.save()
+
+
 def setup_generation(args: Box) -> AbstractLLM:
     """
     Set up generation part of RAG pipeline, i.e. LLM responsible for textual
@@ -81,27 +216,36 @@ def setup_generation(args: Box) -> AbstractLLM:
 
 
 def setup_retrieval(
-    args: Box, docs: List[Document], chunks: List[Document]
-) -> Tuple[AbstractDB, AbstractDB, AutoLLM]:
+    args: Box,
+    docs: Union[List[Document], CountingIterator[Document]],
+    chunks: Union[ChunkStore, CountingIterator[Document]],
+) -> Tuple[AbstractDB, Optional[AbstractDB], Optional[AbstractLLM]]:
     """
     Set up retrieval part of RAG pipeline.
     The possible options include:
         (1) Vector database (mandatory), to include chunks
         (2) BM25 index
-        (3) LLM reranker
+        (3) LLM reranker (or a cascade of them)
 
     Args:
         args (Box)
-        docs List[Documents: Complete list of loaded documents.
-        chunks (List[Document]): List of all chunsk of given documents.
+        docs (Union[List[Document], CountingIterator[Document]]): Complete list
+            of loaded documents.
+        chunks (Union[ChunkStore, CountingIterator[Document]]): Store of all
+            chunks of given documents
+            (of new or modified documents only, if indexing incrementally).
+            When streaming, both are one-shot iterators, consumed by indexing.
 
     Returns:
         ret_db_vec, ret_db_bm25, ret_rerank
-        (Tuple[AbstractDB, AbstractDB, AbstractLLM]): A tuple consisting of:
+        (Tuple[AbstractDB, Optional[AbstractDB], Optional[AbstractLLM]]):
+            A tuple consisting of:
                 (1) ret_db_vec (AbstractDB) - Vector database to store chunks in
                         and do the first step of retrieval.
-                (2) ret_db_bm25 (AbstractDB) - BM25 index, for hybrid search
-                (3) ret_rerank (AbstractLLM) - LLM reranker
+                (2) ret_db_bm25 (Optional[AbstractDB]) - BM25 index, for hybrid
+                        search (if configured)
+                (3) ret_rerank (Optional[AbstractLLM]) - LLM reranker, or a
+                        cascade of them (if configured)
     """
     # LLM used for embedding the chunks
     ret_emb_llm = AutoLLM.from_args(args.retriever.llm)
@@ -110,22 +254,63 @@ def setup_retrieval(
     # as embedding function
     args.retriever.db["emb_func"] = ret_emb_llm
     ret_db_vec = AutoDB.from_args(args.retriever.db)
-    ret_db_vec.add_documents(chunks)
+    if args.retriever.db.incremental:
+        # Incremental indexing cannot be combined with streaming, so documents
+        # and chunks are materialized
+        index_chunks(
+            args, ret_db_vec, cast(List[Document], docs), cast(ChunkStore, chunks)
+        )
+    else:
+        # Chunks are materialized (as Documents) only batch by batch, streamed
+        # ones are embedded and stored while they are streamed
+        for batch in batched(chunks, args.retriever.loading.batch_size):
+            ret_db_vec.add_documents(batch)
+        if isinstance(chunks, CountingIterator):
+            logger.info(f"Streamed {len(chunks)} chunks into the vector database.")
 
     # BM25 setup, for hybrid search
     ret_db_bm25 = None
     if args.retriever.bm25:
         ret_db_bm25 = AutoDB.from_args(Box({"provider": "bm25"}))
-        if args.retriever.bm25 == "docs":
+        if args.retriever.bm25 == "docs" and not isinstance(docs, CountingIterator):
             logger.info("Adding docs into BM25...")
             ret_db_bm25.add_documents(docs)
-        else:
+        elif not (
+            isinstance(chunks, CountingIterator) or args.retriever.db.incremental
+        ):
             logger.info("Adding chunks into BM25...")
             ret_db_bm25.add_documents(chunks)
+        else:
+            if args.retriever.bm25 == "docs":
+                logger.warning("Streamed docs are not kept, adding chunks into BM25...")
+            else:
+                logger.info("Adding chunks into BM25...")
+            # Streamed chunks are not kept in memory, while unchanged chunks are
+            # not re-chunked (when indexing incrementally), so all of them are
+            # taken from the (updated) vector database
+            ret_db_bm25.add_documents(ret_db_vec.get_documents())
 
     # Reranking LLM setup
-    ret_rerank = None
-    if args.retriever.rerank:
+    ret_rerank: Optional[AbstractLLM] = None
+    if isinstance(args.retriever.rerank, list):
+        # Cascade - every reranker reranks the survivors of the previous one
+        ret_rerank = RerankCascade(
+            [
+                (AutoLLM.from_args(stage), stage.rerank_top_n)
+                for stage in args.retriever.rerank
+            ]
+        )
+    elif args.retriever.rerank and args.retriever.rerank.rerank_top_n is not None:
+        # A single reranker, cutting off its results
+        ret_rerank = RerankCascade(
+            [
+                (
+                    AutoLLM.from_args(args.retriever.rerank),
+                    args.retriever.rerank.rerank_top_n,
+                )
+            ]
+        )
+    elif args.retriever.rerank:
         ret_rerank = AutoLLM.from_args(args.retriever.rerank)
 
     return ret_db_vec, ret_db_bm25, ret_rerank
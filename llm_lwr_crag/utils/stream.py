@@ -0,0 +1,105 @@
+import queue
+import threading
+from itertools import islice
+from typing import Generic, Iterable, Iterator, List, TypeVar
+
+__all__ = ["prefetch", "batched", "CountingIterator"]
+
+T = TypeVar("T")
+
+
+class _StageError:
+    """
+    Wrapper around an exception raised within a background stage, so it can be
+    re-raised in the consuming thread.
+    """
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_END = object()  # Marks the end of a stage's output
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 256) -> Iterator[T]:
+    """
+    Run the given iterable (generally, a pipeline stage) in a background thread,
+    connected to the consumer via a bounded queue.
+    Producer blocks once `maxsize` items are waiting to be consumed, which
+    provides backpressure and keeps the memory usage flat.
+
+    Args:
+        iterable (Iterable[T]): Iterable to consume in the background.
+        maxsize (int): Maximum number of produced, yet unconsumed items.
+
+    Returns:
+        Iterator[T]: Items of the `iterable`, in the original order.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Periodically check whether the consumer is gone, to not block forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        put(_END)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    Group items of the iterable into lists of at most `batch_size` items.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+class CountingIterator(Generic[T]):
+    """
+    Iterator wrapper, keeping track of the number of items produced so far.
+    Used in place of lists when streaming, so `len()` reports the number of
+    items that have passed through the stream.
+    """
+
+    def __init__(self, iterable: Iterable[T]):
+        self.iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self) -> "CountingIterator[T]":
+        return self
+
+    def __next__(self) -> T:
+        item = next(self.iterator)
+        self.count += 1
+        return item
+
+    def __len__(self) -> int:
+        return self.count